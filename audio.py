@@ -0,0 +1,145 @@
+import queue
+import random
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import pygame
+
+from synth import CACHE_DIR, SoundCache, SoundScheduler
+
+NOTES = {
+    "C": [261.63, 523.25],
+    "D": [293.66, 587.33],
+    "E": [329.63, 659.25],
+    "F": [349.23, 698.46],
+    "G": [392.00, 783.99],
+    "A": [440.00, 880.00],
+    "B": [493.88, 987.77],
+}
+SCALES = {
+    "C_major_penta": ["C", "D", "E", "G", "A"],
+    "G_major_penta": ["G", "A", "B", "D", "E"],
+    "F_major_penta": ["F", "G", "A", "C", "D"],
+}
+LINE_BEEP_MS = 100  # gap between the beeps of a line clear
+_STOP = object()
+
+
+def generate_melody(key="C", num_notes=64) -> List[Tuple[float, float]]:
+    scale = SCALES.get(f"{key}_major_penta", SCALES["C_major_penta"])
+    melody = []
+    for _ in range(num_notes):
+        note_name = random.choice(scale)
+        octave = random.choice([0, 1])
+        frequency = NOTES[note_name][octave]
+        duration = random.choice([0.1, 0.2, 0.2, 0.3, 0.4])
+        melody.append((frequency, duration))
+    return melody
+
+
+class AudioWorker(threading.Thread):
+    # Owns all synthesis and sequencing: effect sounds, the background melody
+    # and its regeneration, and the timed line-clear beeps. The game loop only
+    # calls post() with the (kind, value) events from GameState.pop_events,
+    # which never blocks; the worker sleeps until the next event or note.
+    # The mixer is opened and the sounds loaded on this thread too, so none
+    # of it delays the first frame.
+    def __init__(self, cache_dir: Optional[str] = CACHE_DIR):
+        super().__init__(name="audio", daemon=True)
+        self.events: "queue.Queue" = queue.Queue()
+        self.cache_dir = cache_dir
+
+    def post(self, kind: str, value: int = 0) -> None:
+        self.events.put_nowait((kind, value))
+
+    def stop(self, timeout: Optional[float] = 1.0) -> None:
+        self.events.put_nowait(_STOP)
+        self.join(timeout)
+
+    def _now(self) -> float:
+        return time.monotonic() * 1000
+
+    def _load(self) -> None:
+        # Synthesize event-based 8-bit chiptune style sound effects
+        self.sounds = SoundCache(cache_dir=self.cache_dir)
+        sounds = self.sounds
+        # Neutral sound for block landing: A3, short beep
+        self.block_land_sound = sounds.get(220.00, 0.1, amplitude=0.3)
+        # Positive sounds for scoring: C5 quick high note, E5 slightly longer
+        # and G5 triumphant longer note
+        self.score_1_point_sound = sounds.get(523.25, 0.05, amplitude=0.4)
+        self.score_100_points_sound = sounds.get(659.25, 0.1, amplitude=0.5)
+        self.score_tetris_sound = sounds.get(783.99, 0.2, amplitude=0.6)
+        # Negative sound for game over: C3, low and slow
+        self.game_over_sound = sounds.get(130.81, 0.5, amplitude=0.5)
+        # Channels for sound effects and background music
+        self.effect_channel = pygame.mixer.Channel(0)
+        self.bg_music_channel = pygame.mixer.Channel(1)
+        self.scheduler = SoundScheduler()
+        self._new_melody()
+
+    def _new_melody(self) -> None:
+        self.bg_melody = generate_melody(random.choice(["C", "F", "G"]))
+        self.bg_notes = self.sounds.render_melody(self.bg_melody)
+        self.current_bg_note = 0
+        self._play_next_bg_note()
+
+    def _play_next_bg_note(self) -> None:
+        # Play the background melody in a loop
+        self.bg_music_channel.play(self.bg_notes[self.current_bg_note])
+        duration = self.bg_melody[self.current_bg_note][1]
+        self.next_bg_note_time = self._now() + duration * 1000
+        self.current_bg_note = (self.current_bg_note + 1) % len(self.bg_melody)
+
+    def _handle(self, kind: str, value: int) -> None:
+        if kind == "soft_drop":
+            self.effect_channel.play(self.score_1_point_sound)
+        elif kind == "landed":
+            self.effect_channel.play(self.block_land_sound)
+        elif kind == "cleared":
+            # One beep per line, LINE_BEEP_MS apart; a tetris follows them
+            now = self._now()
+            for i in range(value):
+                self.scheduler.schedule(
+                    self.score_100_points_sound, now + i * LINE_BEEP_MS
+                )
+            self._tetris_time = now + value * LINE_BEEP_MS
+        elif kind == "tetris":
+            for _ in range(value):
+                self.scheduler.schedule(self.score_tetris_sound, self._tetris_time)
+        elif kind == "cycle":
+            # Change song every lines_per_cycle lines
+            self._new_melody()
+        elif kind == "game_over":
+            self.effect_channel.play(self.game_over_sound)
+
+    def run(self) -> None:
+        try:
+            pygame.mixer.init()
+        except pygame.error:
+            # No audio device: keep taking events so post() stays cheap
+            while self.events.get() is not _STOP:
+                pass
+            return
+        self._load()
+        self._tetris_time = 0.0
+        while True:
+            due = self.next_bg_note_time
+            if self.scheduler:
+                due = min(due, self.scheduler.next_time())
+            try:
+                event = self.events.get(timeout=max(0.0, due - self._now()) / 1000)
+            except queue.Empty:
+                event = None
+            if event is _STOP:
+                break
+            if event is not None:
+                self._handle(*event)
+            now = self._now()
+            if now >= self.next_bg_note_time:
+                self._play_next_bg_note()
+            self.scheduler.update(now)
+        self.effect_channel.stop()
+        self.bg_music_channel.stop()
+        pygame.mixer.quit()
@@ -0,0 +1,233 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from engine import GRID_WIDTH, GRID_HEIGHT, PIECE_NAMES, WALL_KICKS
+from engine import FALL_SPEED, LOCK_DELAY, LINES_PER_CYCLE
+from engine import LEFT, RIGHT, DOWN, ROTATE, HARD_DROP
+from pieces import CELL_OFFSETS, COLOR_INDEX, TETROMINOES
+
+# OFFSETS[piece, rotation] is the (4, 2) array of (x, y) cell offsets, with
+# pieces numbered in PIECE_NAMES order
+OFFSETS = np.array(
+    [[CELL_OFFSETS[name][rotation] for rotation in range(4)] for name in PIECE_NAMES],
+    dtype=np.int64,
+)
+PIECE_COLORS = np.array([COLOR_INDEX[name] for name in PIECE_NAMES], dtype=np.uint8)
+SHAPE_WIDTHS = np.array(
+    [len(TETROMINOES[name]["shape"][0]) for name in PIECE_NAMES], dtype=np.int64
+)
+# Score for clearing 0-3 lines; four lines score 2000 * tetris_multiplier
+LINE_SCORES = np.array([0, 100, 100 * 2 * 2, 100 * 3 * 3], dtype=np.int64)
+TETRIS_SCORE = 100 * 4 * 5
+# Rotation is tried in place first, then with each wall kick
+KICKS = np.array((0,) + WALL_KICKS, dtype=np.int64)
+
+
+class BatchEnv:
+    # N independent games advanced in lockstep. Boards are one (N, height, width)
+    # uint8 array of palette indices and every per-game value is an (N,) array;
+    # step() follows the same rules as engine.GameState.step for each game.
+    def __init__(
+        self,
+        num_envs: int,
+        seed: Optional[int] = None,
+        width: int = GRID_WIDTH,
+        height: int = GRID_HEIGHT,
+    ):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.lines_per_cycle = LINES_PER_CYCLE
+        self.lock_delay = LOCK_DELAY
+        self.boards = np.zeros((num_envs, height, width), dtype=np.uint8)
+        self.piece = np.zeros(num_envs, dtype=np.int64)
+        self.next_piece = np.zeros(num_envs, dtype=np.int64)
+        self.rotation = np.zeros(num_envs, dtype=np.int64)
+        self.x = np.zeros(num_envs, dtype=np.int64)
+        self.y = np.zeros(num_envs, dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.total_lines_cleared = np.zeros(num_envs, dtype=np.int64)
+        self.tetris_multiplier = np.ones(num_envs, dtype=np.int64)
+        self.fall_speed = np.zeros(num_envs, dtype=np.int64)
+        self.fall_time = np.zeros(num_envs, dtype=np.int64)
+        self.lock_timer = np.zeros(num_envs, dtype=np.int64)  # -1 when not resting
+        self.ticks = np.zeros(num_envs, dtype=np.int64)
+        self.block_counts = np.zeros((num_envs, len(PIECE_NAMES)), dtype=np.int64)
+        self.game_over = np.zeros(num_envs, dtype=bool)
+        self.reset()
+
+    def reset(self, mask: Optional[np.ndarray] = None) -> None:
+        # Restart the games selected by a boolean mask, or all of them
+        env = np.arange(self.num_envs) if mask is None else np.flatnonzero(mask)
+        self.boards[env] = 0
+        self.score[env] = 0
+        self.total_lines_cleared[env] = 0
+        self.tetris_multiplier[env] = 1
+        self.fall_speed[env] = FALL_SPEED
+        self.fall_time[env] = 0
+        self.ticks[env] = 0
+        self.block_counts[env] = 0
+        self.game_over[env] = False
+        self.next_piece[env] = self._draw_pieces(len(env))
+        self.block_counts[env, self.next_piece[env]] += 1
+        self._spawn(env)
+
+    def _draw_pieces(self, count: int) -> np.ndarray:
+        return self.rng.integers(0, len(PIECE_NAMES), size=count)
+
+    def _spawn(self, env: np.ndarray) -> None:
+        # Promote next_piece to the current piece and draw a new next piece
+        self.piece[env] = self.next_piece[env]
+        self.next_piece[env] = self._draw_pieces(len(env))
+        self.block_counts[env, self.next_piece[env]] += 1
+        self.rotation[env] = 0
+        self.x[env] = self.width // 2 - SHAPE_WIDTHS[self.piece[env]] // 2
+        self.y[env] = 0
+        self.lock_timer[env] = -1
+        self.game_over[env] |= self._collides(
+            env, self.rotation[env], self.x[env], self.y[env]
+        )
+
+    def _collides(
+        self, env: np.ndarray, rotation: np.ndarray, x: np.ndarray, y: np.ndarray
+    ) -> np.ndarray:
+        # Vectorized Tetromino.collides for the current pieces of games `env`
+        cells = OFFSETS[self.piece[env], rotation]
+        cx = x[:, None] + cells[..., 0]
+        cy = y[:, None] + cells[..., 1]
+        outside = (cx < 0) | (cx >= self.width) | (cy >= self.height)
+        filled = (
+            self.boards[
+                env[:, None],
+                np.clip(cy, 0, self.height - 1),
+                np.clip(cx, 0, self.width - 1),
+            ]
+            != 0
+        )
+        return (outside | ((cy >= 0) & filled)).any(axis=1)
+
+    def _resting(self, env: np.ndarray) -> np.ndarray:
+        return self._collides(env, self.rotation[env], self.x[env], self.y[env] + 1)
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Apply one action per game and advance one tick; returns the score
+        # gained by each game and the game over flags
+        actions = np.asarray(actions)
+        alive = ~self.game_over
+        score = self.score.copy()
+
+        env = np.flatnonzero(alive & ((actions == LEFT) | (actions == RIGHT)))
+        if len(env):
+            x = self.x[env] + np.where(actions[env] == LEFT, -1, 1)
+            env = env[~self._collides(env, self.rotation[env], x, self.y[env])]
+            self.x[env] += np.where(actions[env] == LEFT, -1, 1)
+            resting = env[self._resting(env)]
+            self.lock_timer[resting] = self.ticks[resting]
+
+        env = np.flatnonzero(alive & (actions == DOWN))
+        if len(env):
+            blocked = self._resting(env)
+            moved = env[~blocked]
+            self.y[moved] += 1
+            self.score[moved] += 2
+            # Lock on the next gravity step
+            blocked = env[blocked]
+            self.lock_timer[blocked] = self.ticks[blocked] - self.lock_delay - 1
+
+        env = np.flatnonzero(alive & (actions == ROTATE))
+        if len(env):
+            rotation = (self.rotation[env] + 1) & 3
+            hits = np.stack(
+                [
+                    self._collides(env, rotation, self.x[env] + dx, self.y[env])
+                    for dx in KICKS
+                ],
+                axis=1,
+            )
+            free = ~hits
+            rotated = free.any(axis=1)
+            kick = KICKS[free.argmax(axis=1)]
+            env, rotation, kick = env[rotated], rotation[rotated], kick[rotated]
+            self.rotation[env] = rotation
+            self.x[env] += kick
+            kicked = env[kick != 0]
+            resting = kicked[self._resting(kicked)]
+            self.lock_timer[resting] = self.ticks[resting]
+
+        env = np.flatnonzero(alive & (actions == HARD_DROP))
+        if len(env):
+            # Step every dropping piece down together until all have landed
+            start = self.y[env].copy()
+            falling = env[~self._resting(env)]
+            while len(falling):
+                self.y[falling] += 1
+                falling = falling[~self._resting(falling)]
+            self.score[env] += 2 * (self.y[env] - start)
+            self.fall_time[env] = 0
+            self._lock(env)
+
+        self._tick(np.flatnonzero(~self.game_over))
+        return self.score - score, self.game_over.copy()
+
+    def _tick(self, env: np.ndarray) -> None:
+        self.ticks[env] += 1
+        self.fall_time[env] += 1
+        env = env[self.fall_time[env] >= self.fall_speed[env]]
+        self.fall_time[env] = 0
+        blocked = self._resting(env)
+        falling = env[~blocked]
+        self.y[falling] += 1
+        self.lock_timer[falling] = -1
+        env = env[blocked]
+        unset = env[self.lock_timer[env] < 0]
+        self.lock_timer[unset] = self.ticks[unset]
+        env = env[self.ticks[env] - self.lock_timer[env] > self.lock_delay]
+        if len(env):
+            self._lock(env)
+
+    def _lock(self, env: np.ndarray) -> None:
+        cells = OFFSETS[self.piece[env], self.rotation[env]]
+        cx = self.x[env][:, None] + cells[..., 0]
+        cy = self.y[env][:, None] + cells[..., 1]
+        # Piece has reached the top
+        topped_out = (cy < 0).any(axis=1)
+        self.game_over[env[topped_out]] = True
+        placed = ~topped_out
+        env, cx, cy = env[placed], cx[placed], cy[placed]
+        self.boards[env[:, None], cy, cx] = PIECE_COLORS[self.piece[env]][:, None]
+        self._clear_lines(env)
+        self._spawn(env)
+
+    def _clear_lines(self, env: np.ndarray) -> None:
+        full = (self.boards[env] != 0).all(axis=2)
+        lines_cleared = full.sum(axis=1)
+        cleared = lines_cleared > 0
+        env, full, lines_cleared = env[cleared], full[cleared], lines_cleared[cleared]
+        if not len(env):
+            return
+        # Stable sort moves full rows to the top without reordering the rest,
+        # then the moved rows are emptied
+        order = np.argsort(~full, axis=1, kind="stable")
+        boards = np.take_along_axis(self.boards[env], order[:, :, None], axis=1)
+        boards[np.arange(self.height)[None, :] < lines_cleared[:, None]] = 0
+        self.boards[env] = boards
+
+        tetris = lines_cleared == 4
+        self.score[env] += np.where(
+            tetris,
+            TETRIS_SCORE * self.tetris_multiplier[env],
+            LINE_SCORES[np.minimum(lines_cleared, 3)],
+        )
+        self.tetris_multiplier[env] = np.where(
+            tetris, self.tetris_multiplier[env] + 1, 1
+        )
+        total = self.total_lines_cleared[env] + lines_cleared
+        self.total_lines_cleared[env] = total
+        # Speed up every lines_per_cycle lines
+        cycle = total // self.lines_per_cycle > (total - lines_cleared) // (
+            self.lines_per_cycle
+        )
+        env = env[cycle]
+        self.fall_speed[env] = np.maximum(self.fall_speed[env] - 1, 1)
@@ -0,0 +1,378 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import timeit
+from typing import Callable, Dict, Tuple
+
+# Render benchmarks draw offscreen
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from board import Board  # noqa: E402
+from engine import GameState, GRID_WIDTH, GRID_HEIGHT  # noqa: E402
+from engine import NOOP, LEFT, RIGHT, DOWN, ROTATE  # noqa: E402
+from pieces import Tetromino, TETROMINOES  # noqa: E402
+
+# Each benchmark setup returns (function to time, operations per call)
+BENCHMARKS: Dict[str, Callable[[], Tuple[Callable[[], None], int]]] = {}
+
+
+def benchmark(name: str):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def representative_board(seed: int = 0, filled_rows: int = 8) -> Board:
+    # A mid-game stack: the bottom rows mostly full with a few holes each
+    rng = random.Random(seed)
+    board = Board(GRID_WIDTH, GRID_HEIGHT)
+    for y in range(GRID_HEIGHT - filled_rows, GRID_HEIGHT):
+        holes = set(rng.sample(range(GRID_WIDTH), rng.randint(1, 3)))
+        for x in range(GRID_WIDTH):
+            if x not in holes:
+                board.set_cell(x, y, rng.randint(1, 7))
+    return board
+
+
+def _pieces():
+    rng = random.Random(1)
+    pieces = []
+    for name in TETROMINOES:
+        for rotation in range(4):
+            x = rng.randint(0, GRID_WIDTH - 4)
+            pieces.append(Tetromino(name, x, rng.randint(0, GRID_HEIGHT - 4), rotation))
+    return pieces
+
+
+@benchmark("collides")
+def bench_collides():
+    board = representative_board()
+    pieces = _pieces()
+
+    def run():
+        for piece in pieces:
+            piece.collides(board, dy=1)
+
+    return run, len(pieces)
+
+
+@benchmark("landing_y")
+def bench_landing_y():
+    # Hard drop and ghost piece landing row from the spawn row
+    board = representative_board()
+    pieces = _pieces()
+    for piece in pieces:
+        piece.y = 0
+
+    def run():
+        for piece in pieces:
+            piece.landing_y(board)
+
+    return run, len(pieces)
+
+
+@benchmark("get_positions")
+def bench_get_positions():
+    pieces = _pieces()
+
+    def run():
+        for piece in pieces:
+            piece.get_positions()
+
+    return run, len(pieces)
+
+
+@benchmark("rotate")
+def bench_rotate():
+    pieces = _pieces()
+
+    def run():
+        for piece in pieces:
+            piece.rotate()
+
+    return run, len(pieces)
+
+
+@benchmark("merge_piece_to_grid")
+def bench_merge():
+    state = GameState(0)
+    state.grid = representative_board()
+    state.current_piece = Tetromino("T", 3, 5)
+
+    def run():
+        state.merge_piece_to_grid()
+
+    return run, 1
+
+
+@benchmark("clear_lines")
+def bench_clear_lines():
+    # Four full rows in a mid-game stack; the rows are restored before every
+    # call, which costs two list slice copies
+    state = GameState(0)
+    state.grid = grid = representative_board()
+    for y in range(GRID_HEIGHT - 4, GRID_HEIGHT):
+        for x in range(GRID_WIDTH):
+            grid.set_cell(x, y, 1)
+    rows = grid.rows[:]
+    colors = grid.colors[:]
+    top = grid.top
+
+    def run():
+        grid.rows[:] = rows
+        grid.colors[:] = colors
+        grid.top = top
+        state.clear_lines()
+
+    return run, 1
+
+
+@benchmark("clear_lines_marathon")
+def bench_clear_lines_marathon():
+    # A 40x400 board stacked 300 rows deep; locking a piece clears the two
+    # rows it completed. The rows are restored the same way as clear_lines.
+    state = GameState(0, 40, 400)
+    grid = state.grid
+    rng = random.Random(0)
+    for y in range(100, 400):
+        holes = {rng.randrange(40)} if y not in (300, 301) else set()
+        for x in range(40):
+            if x not in holes:
+                grid.set_cell(x, y, 1)
+    rows = grid.rows[:]
+    colors = grid.colors[:]
+    top = grid.top
+
+    def run():
+        grid.rows[:] = rows
+        grid.colors[:] = colors
+        grid.top = top
+        state.clear_lines([299, 300, 301])
+
+    return run, 1
+
+
+def _render_setup():
+    import pygame
+
+    from renderer import Renderer, WINDOW_WIDTH, WINDOW_HEIGHT
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    state = GameState(0)
+    state.grid = representative_board()
+    return Renderer(screen, GRID_WIDTH, GRID_HEIGHT), state
+
+
+@benchmark("render_full_frame")
+def bench_render_full_frame():
+    # draw_sidebar, draw_grid, draw_current_piece and draw_next_piece
+    renderer, state = _render_setup()
+
+    def run():
+        renderer.draw_frame(state)
+
+    return run, 1
+
+
+@benchmark("render_retained_frame")
+def bench_render_retained_frame():
+    # Incremental render() while the piece moves one column per frame
+    renderer, state = _render_setup()
+    piece = state.current_piece
+
+    def run():
+        piece.x = (piece.x + 1) % (GRID_WIDTH - 2)
+        renderer.render(state)
+
+    return run, 1
+
+
+@benchmark("generate_square_wave")
+def bench_generate_square_wave():
+    from synth import generate_square_wave
+
+    def run():
+        generate_square_wave(440.0, 0.1, amplitude=0.2)
+
+    return run, 1
+
+
+@benchmark("load_cached_samples")
+def bench_load_cached_samples():
+    # The same sound as generate_square_wave, read back from the disk cache
+    import tempfile
+
+    from synth import load_samples
+
+    cache_dir = tempfile.mkdtemp(prefix="bench-sounds-")
+    load_samples(cache_dir, 440.0, 0.1, amplitude=0.2)
+
+    def run():
+        load_samples(cache_dir, 440.0, 0.1, amplitude=0.2)
+
+    return run, 1
+
+
+@benchmark("headless_game")
+def bench_headless_game():
+    # Full seeded games with a random policy; ops/s is games per second. The
+    # actions are pinned to those before hard drop, which would end most
+    # pieces at once and make the numbers incomparable with older runs.
+    actions = (NOOP, LEFT, RIGHT, DOWN, ROTATE)
+    seeds = itertools.cycle(range(20))
+
+    def run():
+        seed = next(seeds)
+        state = GameState(seed)
+        rng = random.Random(seed)
+        while not state.game_over:
+            state.step(rng.choice(actions))
+
+    return run, 1
+
+
+def _mid_game_state() -> GameState:
+    state = GameState(0)
+    state.grid = representative_board()
+    return state
+
+
+@benchmark("snapshot_clone")
+def bench_snapshot_clone():
+    state = _mid_game_state()
+
+    def run():
+        state.clone()
+
+    return run, 1
+
+
+@benchmark("snapshot_bytes")
+def bench_snapshot_bytes():
+    # to_bytes and from_bytes round trip of a seeded game
+    state = _mid_game_state()
+
+    def run():
+        GameState.from_bytes(state.to_bytes())
+
+    return run, 1
+
+
+@benchmark("perft")
+def bench_perft():
+    # Depth-2 perft from a mid-game board in one process; ops/s is placements
+    # enumerated and locked per second. The reference counts are checked
+    # first, so a change that breaks move generation fails here rather than
+    # just timing differently.
+    from perft import perft, reference_mismatches
+
+    mismatches = reference_mismatches()
+    if mismatches:
+        raise RuntimeError("perft reference counts changed: " + "; ".join(mismatches))
+    board = representative_board()
+
+    def run():
+        perft(board, "TI", 2)
+
+    return run, sum(edges for _, edges in perft(board, "TI", 2))
+
+
+@benchmark("bot_decision")
+def bench_bot_decision():
+    # Bot.choose with lookahead on the state at the spawn of every piece of
+    # two bot games, from the first piece to the last (or the tick cap), with
+    # a fresh transposition cache each pass so every decision searches
+    from bot import Bot
+
+    positions = []
+    for seed in (0, 1):
+        state = GameState(seed)
+        player = Bot()
+        serial = -1
+        while not state.game_over and state.ticks < 20_000:
+            if state.total_blocks != serial:
+                serial = state.total_blocks
+                positions.append(state.clone())
+            state.step(player.act(state))
+
+    def run():
+        decide = Bot().choose
+        for position in positions:
+            decide(position)
+
+    return run, len(positions)
+
+
+def measure(setup, repeat: int) -> float:
+    # Best-of-repeat time per operation in nanoseconds
+    run, ops = setup()
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / (number * ops) * 1e9
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark engine, renderer and audio hot paths"
+    )
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="PATH", help="write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="percent slowdown against the baseline that counts as a regression",
+    )
+    parser.add_argument("--list", action="store_true", help="list benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    regressions = []
+    for name in args.names or BENCHMARKS:
+        ns = measure(BENCHMARKS[name], args.repeat)
+        results[name] = ns
+        line = f"{name:24}{ns:>14.1f} ns/op{1e9 / ns:>14.1f} ops/s"
+        if name in baseline:
+            change = (ns / baseline[name] - 1) * 100
+            line += f"{change:>+9.1f}%"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+            f.write("\n")
+    if regressions:
+        print(
+            f"{len(regressions)} regression(s) over {args.threshold}%: "
+            + ", ".join(regressions)
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+from typing import Iterable, List, Optional, Tuple
+
+from pieces import PALETTE
+
+
+class Board:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.full_mask = (1 << width) - 1
+        # Occupancy bitmask per row: bit x of rows[y] is set when (x, y) is filled
+        self.rows = [0] * height
+        # Palette index per cell (see pieces.PALETTE), 0 means empty
+        self.colors = [bytearray(width) for _ in range(height)]
+        # Highest row that may be filled; every row above it is empty
+        self.top = height
+        # Highest filled row of each column, height when the column is empty
+        self.column_tops = [height] * width
+        # Bumped on every change so views of the board can tell when to refresh
+        self.version = 0
+
+    def copy(self) -> "Board":
+        board = Board(self.width, self.height)
+        board.rows = self.rows[:]
+        board.colors = [bytearray(row) for row in self.colors]
+        board.top = self.top
+        board.column_tops = self.column_tops[:]
+        return board
+
+    def reindex(self) -> None:
+        # Recompute top and column_tops after rows were assigned directly
+        top = self.height
+        for y, row in enumerate(self.rows):
+            if row:
+                top = y
+                break
+        self.top = top
+        self._index_columns()
+
+    def _index_columns(self) -> None:
+        # Scan down from the top of the stack until every column has been
+        # seen, which takes only the first few rows of a typical stack
+        column_tops = [self.height] * self.width
+        pending = self.full_mask
+        rows = self.rows
+        for y in range(self.top, self.height):
+            found = rows[y] & pending
+            if found:
+                pending ^= found
+                while found:
+                    low = found & -found
+                    column_tops[low.bit_length() - 1] = y
+                    found ^= low
+                if not pending:
+                    break
+        self.column_tops = column_tops
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        return bool(self.rows[y] >> x & 1)
+
+    def get_color(self, x: int, y: int) -> Tuple[int, int, int]:
+        return PALETTE[self.colors[y][x]]
+
+    def set_cell(self, x: int, y: int, color_index: int) -> None:
+        self.rows[y] |= 1 << x
+        self.colors[y][x] = color_index
+        if y < self.top:
+            self.top = y
+        if y < self.column_tops[x]:
+            self.column_tops[x] = y
+        self.version += 1
+
+    def clear_cell(self, x: int, y: int) -> None:
+        self.rows[y] &= ~(1 << x)
+        self.colors[y][x] = 0
+        if self.column_tops[x] == y:
+            bit = 1 << x
+            below = y + 1
+            while below < self.height and not self.rows[below] & bit:
+                below += 1
+            self.column_tops[x] = below
+        self.version += 1
+
+    def occupied_cells(self) -> List[Tuple[int, int, int]]:
+        # (x, y, palette index) for every filled cell, top row first
+        cells = []
+        for y, row in enumerate(self.rows):
+            if row:
+                colors = self.colors[y]
+                for x in range(self.width):
+                    if row >> x & 1:
+                        cells.append((x, y, colors[x]))
+        return cells
+
+    def clear_lines(self, candidates: Optional[Iterable[int]] = None) -> int:
+        # Remove full rows and drop the rows above them. With candidates (the
+        # rows a merged piece touched) only those rows are checked. Only the
+        # rows between the top of the stack and the lowest cleared row move;
+        # the empty rows above and the rows below stay where they are.
+        full = self.full_mask
+        rows = self.rows
+        if candidates is None:
+            if full not in rows:
+                return 0
+            cleared = [y for y in range(self.top, self.height) if rows[y] == full]
+        else:
+            cleared = sorted(y for y in set(candidates) if rows[y] == full)
+            if not cleared:
+                return 0
+        lines_cleared = len(cleared)
+        top = self.top
+        bottom = cleared[-1] + 1
+        kept = [y for y in range(top, bottom) if rows[y] != full]
+        rows[top + lines_cleared : bottom] = [rows[y] for y in kept]
+        rows[top : top + lines_cleared] = [0] * lines_cleared
+        colors = self.colors
+        colors[top + lines_cleared : bottom] = [colors[y] for y in kept]
+        colors[top : top + lines_cleared] = [
+            bytearray(self.width) for _ in range(lines_cleared)
+        ]
+        self.top = top + lines_cleared
+        self._index_columns()
+        self.version += 1
+        return lines_cleared
@@ -0,0 +1,505 @@
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from engine import GameState, NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP, WALL_KICKS
+from pieces import CELL_OFFSETS, ROW_MASKS, TETROMINOES
+
+# (rotation, x, y) of a piece on the board
+PieceState = Tuple[int, int, int]
+
+# Plain rotation first, then the wall kicks GameState.apply tries
+KICKS = (0,) + WALL_KICKS
+
+# Board evaluation weights (aggregate height, lines cleared, holes, bumpiness)
+WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+
+class Placement(NamedTuple):
+    rotation: int
+    x: int
+    y: int
+    rows: Tuple[int, ...]  # occupancy after locking and clearing lines
+    lines_cleared: int
+
+
+@lru_cache(maxsize=None)
+def piece_bits(name: str, width: int) -> Tuple[Dict[int, int], ...]:
+    # Per rotation, x -> the piece's cells as one integer in the board_bits()
+    # layout with the top row of the piece at row 0. x values where the piece
+    # would cross a wall are missing.
+    table = []
+    for left, right, masks in ROW_MASKS[name]:
+        by_x = {}
+        for x in range(-left, width - right):
+            bits = 0
+            for r, mask in masks:
+                bits |= mask << (x + left) << (r * width)
+            by_x[x] = bits
+        table.append(by_x)
+    return tuple(table)
+
+
+def board_bits(rows: Sequence[int], width: int) -> int:
+    # The board as one integer, `width` bits per row, with a full row below
+    # the floor so a single AND tests floor and stack together (piece_bits()
+    # leaves out the positions through the walls)
+    bits = ((1 << width) - 1) << (len(rows) * width)
+    for y, row in enumerate(rows):
+        if row:
+            bits |= row << (y * width)
+    return bits
+
+
+def fits(board: int, table, width: int, rotation: int, x: int, y: int) -> bool:
+    bits = table[rotation].get(x)
+    return bits is not None and not board & bits << (y * width)
+
+
+@lru_cache(maxsize=None)
+def column_spans(name: str) -> Tuple[Tuple[Tuple[int, int, int], ...], ...]:
+    # Per rotation, (column, top row, bottom row) of every column the piece
+    # fills; a tetromino's cells in one column are always contiguous
+    spans = []
+    for offsets in CELL_OFFSETS[name]:
+        columns = sorted({x for x, _ in offsets})
+        spans.append(
+            tuple(
+                (
+                    column,
+                    min(y for x, y in offsets if x == column),
+                    max(y for x, y in offsets if x == column),
+                )
+                for column in columns
+            )
+        )
+    return tuple(spans)
+
+
+def surface(rows: Sequence[int], width: int) -> Tuple[List[int], int]:
+    # The top filled row of every column (len(rows) when empty) and the number
+    # of holes, the empty cells below a column's top
+    column_tops = [len(rows)] * width
+    seen = 0
+    holes = 0
+    for y, row in enumerate(rows):
+        holes += (seen & ~row).bit_count()
+        new = row & ~seen
+        while new:
+            column = (new & -new).bit_length() - 1
+            column_tops[column] = y
+            new &= new - 1
+        seen |= row
+    return column_tops, holes
+
+
+def search(
+    rows: Sequence[int], width: int, name: str, start: PieceState
+) -> Dict[PieceState, Optional[Tuple[PieceState, int]]]:
+    # Breadth-first search over the (rotation, x, y) the piece can reach from
+    # start with the moves GameState.apply allows, including the wall kicks
+    # tried on rotation. Maps each visited state to (parent, action); every
+    # reachable resting state is included.
+    table = piece_bits(name, width)
+    board = board_bits(rows, width)
+    parents: Dict[PieceState, Optional[Tuple[PieceState, int]]] = {start: None}
+    queue = deque([start])
+
+    def expand(vertical: bool) -> None:
+        # Visit everything reachable from the queued states. fits() is inlined
+        # and the moves are tried in place: this is the hot loop of every
+        # decision.
+        popleft = queue.popleft
+        append = queue.append
+        while queue:
+            current = popleft()
+            rotation, x, y = current
+            shift = y * width
+            by_x = table[rotation]
+            bits = by_x.get(x - 1)
+            if bits is not None and not board & bits << shift:
+                state = (rotation, x - 1, y)
+                if state not in parents:
+                    parents[state] = (current, LEFT)
+                    append(state)
+            bits = by_x.get(x + 1)
+            if bits is not None and not board & bits << shift:
+                state = (rotation, x + 1, y)
+                if state not in parents:
+                    parents[state] = (current, RIGHT)
+                    append(state)
+            if vertical and not board & by_x[x] << (shift + width):
+                state = (rotation, x, y + 1)
+                if state not in parents:
+                    parents[state] = (current, DOWN)
+                    append(state)
+            rotated = (rotation + 1) & 3
+            by_x = table[rotated]
+            for dx in KICKS:
+                bits = by_x.get(x + dx)
+                if bits is not None and not board & bits << shift:
+                    state = (rotated, x + dx, y)
+                    if state not in parents:
+                        parents[state] = (current, ROTATE)
+                        append(state)
+                    break
+
+    top = next((y for y, row in enumerate(rows) if row), len(rows))
+    bottoms = [top - masks[-1][0] - 1 for _, _, masks in ROW_MASKS[name]]
+    if start[2] <= min(bottoms):
+        # Every rotation at the start height is clear of the stack, so only
+        # the walls matter until the piece nears it: expand the start row,
+        # then drop each state straight down without visiting the rows in
+        # between. Only the states a rotation could carry into the stack are
+        # kept, parented by a multi-row DOWN that plan() expands again.
+        y = start[2]
+        reach = min(bottoms) + 1  # From here down a rotation can hit the stack
+        expand(False)
+        column_tops, holes = surface(rows, width)
+        if not holes:
+            # Every column is solid below its top, so nothing can be tucked
+            # under an overhang: the resting states are exactly the straight
+            # drops onto the surface, and the stack needs no search at all
+            spans = column_spans(name)
+            for rotation, x, _ in list(parents):
+                landing = min(
+                    column_tops[x + column] - 1 - bottom
+                    for column, _, bottom in spans[rotation]
+                )
+                if landing > y:
+                    parents[(rotation, x, landing)] = ((rotation, x, y), DOWN)
+            return parents
+        for rotation, x, _ in list(parents):
+            current = (rotation, x, y)
+            bottom = bottoms[rotation]
+            first = max(y + 1, min(bottom, reach))
+            if first > bottom:  # Already resting on the stack's top row
+                queue.append(current)
+            for below in range(first, bottom + 1):
+                state = (rotation, x, below)
+                parents[state] = (current, DOWN)
+                queue.append(state)
+                current = state
+    expand(True)
+    return parents
+
+
+@lru_cache(maxsize=None)
+def distinct_rotations(name: str, width: int) -> Tuple[int, ...]:
+    # One rotation per distinct set of cells the piece can cover (the O piece
+    # has one, I, S and Z have two), the one whose filled rows start highest
+    # in its shape: it is the one that still fits at the top of a full board
+    best: Dict[frozenset, int] = {}
+    for rotation, by_x in enumerate(piece_bits(name, width)):
+        top = ROW_MASKS[name][rotation][2][0][0]  # First filled row
+        cells = frozenset(bits >> (top * width) for bits in by_x.values())
+        kept = best.get(cells)
+        if kept is None or top < ROW_MASKS[name][kept][2][0][0]:
+            best[cells] = rotation
+    return tuple(sorted(best.values()))
+
+
+def best_drop(rows: Sequence[int], width: int, name: str, weights=WEIGHTS) -> float:
+    # Highest evaluate() over the boards the piece leaves when dropped straight
+    # down from above the stack (placements that need a slide under an
+    # overhang are left out), -1000 if it cannot rest anywhere. A drop that
+    # clears no lines only changes the columns under the piece, which are side
+    # by side, so its terms follow from prefix sums over the surface() rather
+    # than locking the piece and evaluating the whole board; the result is
+    # the same.
+    height = len(rows)
+    column_tops, holes = surface(rows, width)
+    heights = [height - top for top in column_tops]
+    steps = [abs(a - b) for a, b in zip(heights, heights[1:])]
+    height_sums = [0]
+    for h in heights:
+        height_sums.append(height_sums[-1] + h)
+    step_sums = [0]
+    for step in steps:
+        step_sums.append(step_sums[-1] + step)
+    aggregate_height = height_sums[-1]
+    bumpiness = step_sums[-1]
+    # The empty cells of every row a drop could complete
+    full = (1 << width) - 1
+    missing = {
+        y: full ^ row for y, row in enumerate(rows) if row.bit_count() >= width - 4
+    }
+    height_weight, lines_weight, holes_weight, bumpiness_weight = weights
+    best = -1000
+    table = piece_bits(name, width)
+    for rotation in distinct_rotations(name, width):
+        spans = column_spans(name)[rotation]
+        left, _, masks = ROW_MASKS[name][rotation]
+        count = len(spans)
+        first, first_top, _ = spans[0]
+        last, last_top, _ = spans[-1]
+        top_sum = sum(top for _, top, _ in spans)
+        bottom_sum = sum(bottom for _, _, bottom in spans)
+        # Steps between the piece's own columns
+        inner = sum(abs(a[1] - b[1]) for a, b in zip(spans, spans[1:]))
+        for x in table[rotation]:
+            y = height
+            for column, _, bottom in spans:
+                rest = column_tops[x + column] - 1 - bottom
+                if rest < y:
+                    y = rest
+            if y < 0:
+                continue
+            if missing:
+                clears = False
+                for r, mask in masks:
+                    if missing.get(y + r) == mask << (x + left):
+                        clears = True
+                        break
+                if clears:
+                    after, lines_cleared = lock(rows, width, name, (rotation, x, y))
+                    value = evaluate(after, width, lines_cleared, weights)
+                    if value > best:
+                        best = value
+                    continue
+            lo = x + first
+            hi = x + last
+            covered = height_sums[hi + 1] - height_sums[lo]
+            new_height = aggregate_height - covered + count * (height - y) - top_sum
+            # Gaps between each column's old top and the piece's bottom
+            new_holes = holes + count * (height - 1 - y) - covered - bottom_sum
+            new_bumpiness = (
+                bumpiness
+                - step_sums[min(hi + 1, width - 1)]
+                + step_sums[max(lo - 1, 0)]
+                + inner
+            )
+            if lo > 0:
+                new_bumpiness += abs(heights[lo - 1] - (height - y - first_top))
+            if hi < width - 1:
+                new_bumpiness += abs(height - y - last_top - heights[hi + 1])
+            value = (
+                height_weight * new_height
+                + lines_weight * 0
+                + holes_weight * new_holes
+                + bumpiness_weight * new_bumpiness
+            )
+            if value > best:
+                best = value
+    return best
+
+
+def plan(
+    parents: Dict[PieceState, Optional[Tuple[PieceState, int]]], target: PieceState
+) -> List[Tuple[PieceState, int]]:
+    # (state before, action) for each move from the search start to target
+    steps = []
+    step = parents[target]
+    while step is not None:
+        parent, action = step
+        if action == DOWN:
+            rotation, x, y = parent
+            for below in range(target[2] - 1, y - 1, -1):
+                steps.append(((rotation, x, below), DOWN))
+        else:
+            steps.append(step)
+        target = parent
+        step = parents[target]
+    steps.reverse()
+    return steps
+
+
+def lock(rows: Sequence[int], width: int, name: str, piece: PieceState):
+    # Rows after merging the piece and clearing full lines, and the line count
+    rotation, x, y = piece
+    left, _, masks = ROW_MASKS[name][rotation]
+    result = list(rows)
+    for r, mask in masks:
+        result[y + r] |= mask << (x + left)
+    full = (1 << width) - 1
+    if full not in result:
+        return tuple(result), 0
+    kept = [row for row in result if row != full]
+    lines_cleared = len(result) - len(kept)
+    return (0,) * lines_cleared + tuple(kept), lines_cleared
+
+
+def evaluate(rows: Sequence[int], width: int, lines_cleared: int, weights=WEIGHTS):
+    # Weighted aggregate height, lines, holes and bumpiness of a board. Every
+    # term is summed row by row from `seen`, the columns filled at or above
+    # the row: a column of height h is seen in h rows, and neighbouring
+    # columns differ in exactly |h1 - h2| rows.
+    pairs = (1 << (width - 1)) - 1
+    seen = 0
+    aggregate_height = holes = bumpiness = 0
+    for row in rows:
+        if row or seen:
+            holes += (seen & ~row).bit_count()
+            seen |= row
+            aggregate_height += seen.bit_count()
+            bumpiness += ((seen ^ seen >> 1) & pairs).bit_count()
+    height_weight, lines_weight, holes_weight, bumpiness_weight = weights
+    return (
+        height_weight * aggregate_height
+        + lines_weight * lines_cleared
+        + holes_weight * holes
+        + bumpiness_weight * bumpiness
+    )
+
+
+def spawn_state(name: str, width: int) -> PieceState:
+    return 0, width // 2 - len(TETROMINOES[name]["shape"][0]) // 2, 0
+
+
+class Bot:
+    # Placement-search AI. For the current piece it enumerates every reachable
+    # final placement, scores the resulting boards with evaluate() and, with
+    # lookahead, adds the best straight drop of next_piece for the `beam`
+    # most promising ones. Placement lists and evaluations are memoized
+    # by board so repeated positions cost a dictionary lookup.
+    def __init__(
+        self,
+        lookahead: bool = True,
+        beam: int = 2,
+        weights=WEIGHTS,
+        cache_size: int = 50_000,
+        hard_drop: bool = False,
+    ):
+        self.lookahead = lookahead
+        # Hard drop once the rest of the route is straight down, rather than
+        # soft dropping row by row (much faster play, far more decisions/s)
+        self.hard_drop = hard_drop
+        self.beam = beam
+        self.weights = weights
+        self.cache_size = cache_size
+        self._placements: Dict[tuple, List[Placement]] = {}
+        self._scores: Dict[tuple, float] = {}
+        self._follow_ups: Dict[tuple, float] = {}
+        self._piece_serial = -1
+        self._target: Optional[PieceState] = None
+        self._plan: List[Tuple[PieceState, int]] = []  # reversed
+        self._last_search = None
+
+    def placements(
+        self, rows: Sequence[int], width: int, name: str, start: PieceState
+    ) -> List[Placement]:
+        # Every distinct resting position reachable from start
+        rows = tuple(rows)
+        key = (rows, width, name, start)
+        cached = self._placements.get(key)
+        if cached is not None:
+            return cached
+        parents = self._search(rows, width, name, start)
+        table = piece_bits(name, width)
+        board = board_bits(rows, width)
+        result = []
+        seen = set()
+        for rotation, x, y in parents:
+            cells = table[rotation][x] << (y * width)
+            if board & cells << width and cells not in seen:
+                # Resting, and not the same cells as an earlier placement
+                # (the O piece's rotations, say)
+                seen.add(cells)
+                after, lines_cleared = lock(rows, width, name, (rotation, x, y))
+                result.append(Placement(rotation, x, y, after, lines_cleared))
+        if len(self._placements) >= self.cache_size:
+            self._placements.clear()
+        self._placements[key] = result
+        return result
+
+    def _search(self, rows, width, name, start):
+        # search(), remembering the last result: act() plans its path through
+        # the search choose() just ran for the same piece
+        key = (tuple(rows), width, name, start)
+        if self._last_search is None or self._last_search[0] != key:
+            self._last_search = key, search(rows, width, name, start)
+        return self._last_search[1]
+
+    def score(self, placement: Placement, width: int) -> float:
+        key = (placement.rows, placement.lines_cleared)
+        value = self._scores.get(key)
+        if value is None:
+            if len(self._scores) >= self.cache_size:
+                self._scores.clear()
+            value = evaluate(
+                placement.rows, width, placement.lines_cleared, self.weights
+            )
+            self._scores[key] = value
+        return value
+
+    def choose(self, state: GameState) -> Optional[Placement]:
+        # Best final placement for the current piece, or None if it cannot move
+        grid = state.grid
+        piece = state.current_piece
+        start = (piece.rotation, piece.x, piece.y)
+        candidates = self.placements(grid.rows, grid.width, piece.name, start)
+        if not candidates:
+            return None
+        width = grid.width
+        ranked = sorted(candidates, key=lambda p: self.score(p, width), reverse=True)
+        if not self.lookahead or state.next_piece is None:
+            return ranked[0]
+        next_name = state.next_piece.name
+        next_start = spawn_state(next_name, width)
+        best = None
+        best_value = float("-inf")
+        for placement in ranked[: self.beam]:
+            board = board_bits(placement.rows, width)
+            if not fits(board, piece_bits(next_name, width), width, *next_start):
+                value = self.score(placement, width) - 1000  # Tops out
+            else:
+                value = (
+                    self.follow_up(placement.rows, width, next_name)
+                    + self.weights[1] * placement.lines_cleared
+                )
+            if value > best_value:
+                best, best_value = placement, value
+        return best
+
+    def follow_up(self, rows: Tuple[int, ...], width: int, name: str) -> float:
+        # Best score of the next piece dropped onto rows. Only straight drops
+        # are tried: a full search per beam candidate would cost several times
+        # the decision itself, for a value that only ranks the candidates.
+        key = (rows, width, name)
+        value = self._follow_ups.get(key)
+        if value is None:
+            value = best_drop(rows, width, name, self.weights)
+            if len(self._follow_ups) >= self.cache_size:
+                self._follow_ups.clear()
+            self._follow_ups[key] = value
+        return value
+
+    def act(self, state: GameState) -> int:
+        # Policy interface: the next action toward the chosen placement
+        if state.game_over:
+            return NOOP
+        piece = state.current_piece
+        current = (piece.rotation, piece.x, piece.y)
+        if state.total_blocks != self._piece_serial:
+            self._piece_serial = state.total_blocks
+            placement = self.choose(state)
+            self._target = placement and placement[:3]
+            self._plan = []
+        if self._target is None:
+            return DOWN
+        if current == self._target:
+            return HARD_DROP  # Resting on the target: lock now
+        while self._plan and self._plan[-1][0] != current:
+            # Gravity may have carried the piece further along the route
+            self._plan.pop()
+        if not self._plan:
+            # New piece, or gravity moved it off the planned route
+            parents = self._search(
+                state.grid.rows, state.grid.width, piece.name, current
+            )
+            if self._target not in parents:
+                placement = self.choose(state)
+                self._target = placement and placement[:3]
+                if self._target is None or self._target == current:
+                    return DOWN
+            self._plan = plan(parents, self._target)
+            self._plan.reverse()
+        if self.hard_drop and all(action == DOWN for _, action in self._plan):
+            # Straight down onto the target from here
+            self._plan = []
+            return HARD_DROP
+        return self._plan.pop()[1]
+
+
+def bot_policy(seed: int):
+    return Bot().act
@@ -0,0 +1,104 @@
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+import pygame
+
+from engine import TICK_RATE, LEFT, RIGHT, DOWN
+
+REPEATABLE_ACTIONS = (LEFT, RIGHT, DOWN)
+
+
+def ms_to_ticks(milliseconds: float) -> int:
+    return max(1, round(milliseconds * TICK_RATE / 1000))
+
+
+class KeyRepeat:
+    # Delayed auto shift counted in simulation ticks, so held keys repeat the
+    # same way at any frame rate and replay deterministically
+    def __init__(self, delay_ms: float = 200, rate_ms: float = 50):
+        self.delay = ms_to_ticks(delay_ms)  # ticks before repeat starts
+        self.rate = ms_to_ticks(rate_ms)  # ticks between repeats
+        self.held: Dict[int, int] = {}  # action -> ticks held
+
+    def press(self, action: int) -> None:
+        if action in REPEATABLE_ACTIONS:
+            self.held[action] = 0
+
+    def release(self, action: int) -> None:
+        self.held.pop(action, None)
+
+    def clear(self) -> None:
+        self.held.clear()
+
+    def tick(self) -> List[int]:
+        # Advance one tick and return the actions that repeat on it
+        repeats = []
+        for action, held in self.held.items():
+            held += 1
+            self.held[action] = held
+            if held >= self.delay and (held - self.delay) % self.rate == 0:
+                repeats.append(action)
+        return repeats
+
+
+class InputDispatcher:
+    # Reads the frame's pygame events in one pass. Presses and releases of
+    # mapped keys go on a queue as (time, action, pressed); tick() drains it
+    # into the key repeat state and the actions for the next simulation
+    # tick, so presses and their repeats reach the game in order. Every other
+    # event is handed back to the caller.
+    #
+    # Latency runs from the poll that read a press to displayed(), called
+    # once the frame showing its result is on screen. pygame events carry no
+    # timestamp, so the time an event waited before the poll (under a frame)
+    # is not included.
+    def __init__(
+        self,
+        key_actions: Dict[int, int],
+        key_repeat: KeyRepeat,
+        clock=time.perf_counter,
+    ):
+        self.key_actions = key_actions
+        self.key_repeat = key_repeat
+        self.clock = clock
+        self.enabled = True  # False ignores the keys, e.g. while a bot plays
+        self.queue: Deque[Tuple[float, int, bool]] = deque()
+        self._applied: List[float] = []  # times of presses not yet displayed
+
+    def poll(self, events) -> list:
+        now = self.clock()
+        other = []
+        for event in events:
+            if (
+                event.type in (pygame.KEYDOWN, pygame.KEYUP)
+                and event.key in self.key_actions
+            ):
+                if self.enabled:
+                    action = self.key_actions[event.key]
+                    self.queue.append((now, action, event.type == pygame.KEYDOWN))
+            else:
+                other.append(event)
+        return other
+
+    def tick(self) -> List[int]:
+        # Actions for one simulation tick: queued presses, then key repeats
+        actions = []
+        queue = self.queue
+        while queue:
+            at, action, pressed = queue.popleft()
+            if pressed:
+                self.key_repeat.press(action)
+                actions.append(action)
+                self._applied.append(at)
+            else:
+                self.key_repeat.release(action)
+        actions.extend(self.key_repeat.tick())
+        return actions
+
+    def displayed(self) -> List[float]:
+        # Milliseconds from each press applied since the last call to now
+        now = self.clock()
+        latencies = [(now - at) * 1000 for at in self._applied]
+        self._applied.clear()
+        return latencies
@@ -0,0 +1,441 @@
+import os
+import struct
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from board import Board
+from pieces import Tetromino, TETROMINOES
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+
+# The simulation advances in fixed ticks; gravity and lock delay count ticks
+TICK_RATE = 60  # ticks per second
+FALL_SPEED = 20  # ticks per row at the start of a game
+LOCK_DELAY = 5  # ticks a resting piece waits before locking
+LINES_PER_CYCLE = 10  # lines between speed-ups
+
+# Actions accepted by GameState.apply/step
+NOOP = 0
+LEFT = 1
+RIGHT = 2
+DOWN = 3
+ROTATE = 4
+HARD_DROP = 5
+ACTIONS = (NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP)
+ACTION_NAMES = ("noop", "left", "right", "down", "rotate", "hard_drop")
+
+# Horizontal offsets tried when a rotation collides
+WALL_KICKS = (1, -1, 2, -2)
+
+PIECE_NAMES = list(TETROMINOES.keys())
+
+# GameState.to_bytes layout: SNAPSHOT, the block counts in PIECE_NAMES order,
+# one palette byte per cell, the seed when it is a 64-bit integer (SEEDED),
+# then the PieceRandom state, so restoring costs the same at any point of a
+# game.
+SNAPSHOT_MAGIC = b"VTSS"
+SNAPSHOT_VERSION = 4
+SNAPSHOT = struct.Struct("<4sBBHHIIHHHHHiIIBBhhBBhh")
+BLOCK_COUNTS = struct.Struct(f"<{len(PIECE_NAMES)}I")
+SEED = struct.Struct("<Q")
+RNG_STATE = struct.Struct("<Q")
+# SNAPSHOT flags
+SEEDED = 1
+LOCK_TIMER = 2
+GAME_OVER = 4
+
+
+class LockedPiece(NamedTuple):
+    # Value of a "placed" event: where a piece locked, the lines it cleared
+    # and the ticks from its spawn to the lock
+    name: str
+    rotation: int
+    x: int
+    y: int
+    lines: int
+    ticks: int
+
+
+Event = Tuple[str, Union[int, LockedPiece]]
+
+
+MASK64 = 2**64 - 1
+
+
+class PieceRandom:
+    # SplitMix64: the piece sequence's generator, owned by the engine so a
+    # game's whole random state is one 64-bit integer that snapshots store in
+    # eight bytes and clone() copies as one int. Seeds are taken modulo 2**64.
+    __slots__ = ("state",)
+
+    def __init__(self, seed: int = 0):
+        self.state = seed & MASK64
+
+    def next64(self) -> int:
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def below(self, n: int) -> int:
+        # Uniform in range(n): draws past the last whole multiple of n are
+        # rejected so no value is favoured
+        limit = 2**64 - 2**64 % n
+        while True:
+            value = self.next64()
+            if value < limit:
+                return value % n
+
+    def choice(self, seq):
+        return seq[self.below(len(seq))]
+
+
+class GameState:
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        width: int = GRID_WIDTH,
+        height: int = GRID_HEIGHT,
+    ):
+        self.width = width
+        self.height = height
+        self.reset(seed)
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        self.seed = seed
+        self.rng = PieceRandom(
+            int.from_bytes(os.urandom(8), "little") if seed is None else seed
+        )
+        self.grid = Board(self.width, self.height)
+        self.score = 0
+        self.total_lines_cleared = 0
+        self.tetris_multiplier = 1
+        self.lines_per_cycle = LINES_PER_CYCLE
+        self.fall_speed = FALL_SPEED
+        self.lock_delay = LOCK_DELAY
+        self.fall_time = 0
+        self.lock_timer: Optional[int] = None
+        self.ticks = 0
+        self.spawn_tick = 0  # tick the current piece spawned on
+        self.block_counts = {name: 0 for name in PIECE_NAMES}
+        self.total_blocks = 0
+        self.game_over = False
+        # (kind, value) pairs describing what happened, for sound and stats:
+        # "soft_drop", "hard_drop" (rows), "landed", "cleared" (lines),
+        # "tetris" (multiplier), "cycle" (lines_per_cycle boundary crossed),
+        # "placed" (a LockedPiece) and "game_over"
+        self.events: List[Event] = []
+        self.current_piece = self.spawn_piece()
+        self.next_piece = self.spawn_piece()
+        if self.current_piece.collides(self.grid):
+            self.end_game()
+
+    def clone(self) -> "GameState":
+        # Independent copy, sharing nothing mutable with this state
+        state = GameState.__new__(GameState)
+        state.__dict__.update(self.__dict__)
+        state.rng = PieceRandom(self.rng.state)
+        state.grid = self.grid.copy()
+        state.block_counts = dict(self.block_counts)
+        state.events = list(self.events)
+        for attr in ("current_piece", "next_piece"):
+            piece = getattr(self, attr)
+            setattr(
+                state, attr, Tetromino(piece.name, piece.x, piece.y, piece.rotation)
+            )
+        return state
+
+    def restore(self, snapshot: Union[bytes, "GameState"]) -> None:
+        # Become a copy of a snapshot (to_bytes data or a state) in place, so
+        # references to this state stay valid
+        if isinstance(snapshot, GameState):
+            snapshot = snapshot.clone()
+        else:
+            snapshot = GameState.from_bytes(snapshot)
+        self.__dict__.update(snapshot.__dict__)
+
+    def to_bytes(self) -> bytes:
+        seeded = isinstance(self.seed, int) and 0 <= self.seed < 2**64
+        flags = (
+            (SEEDED if seeded else 0)
+            | (LOCK_TIMER if self.lock_timer is not None else 0)
+            | (GAME_OVER if self.game_over else 0)
+        )
+        current, following = self.current_piece, self.next_piece
+        parts = [
+            SNAPSHOT.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                flags,
+                self.width,
+                self.height,
+                self.score,
+                self.total_lines_cleared,
+                self.tetris_multiplier,
+                self.lines_per_cycle,
+                self.fall_speed,
+                self.lock_delay,
+                self.fall_time,
+                self.lock_timer or 0,
+                self.ticks,
+                self.spawn_tick,
+                PIECE_NAMES.index(current.name),
+                current.rotation,
+                current.x,
+                current.y,
+                PIECE_NAMES.index(following.name),
+                following.rotation,
+                following.x,
+                following.y,
+            ),
+            BLOCK_COUNTS.pack(*(self.block_counts[name] for name in PIECE_NAMES)),
+            *self.grid.colors,
+        ]
+        if seeded:
+            parts.append(SEED.pack(self.seed))
+        parts.append(RNG_STATE.pack(self.rng.state))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GameState":
+        (
+            magic,
+            version,
+            flags,
+            width,
+            height,
+            score,
+            total_lines_cleared,
+            tetris_multiplier,
+            lines_per_cycle,
+            fall_speed,
+            lock_delay,
+            fall_time,
+            lock_timer,
+            ticks,
+            spawn_tick,
+            current_name,
+            current_rotation,
+            current_x,
+            current_y,
+            next_name,
+            next_rotation,
+            next_x,
+            next_y,
+        ) = SNAPSHOT.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("not a vibetris snapshot")
+        state = cls.__new__(cls)
+        state.width = width
+        state.height = height
+        state.score = score
+        state.total_lines_cleared = total_lines_cleared
+        state.tetris_multiplier = tetris_multiplier
+        state.lines_per_cycle = lines_per_cycle
+        state.fall_speed = fall_speed
+        state.lock_delay = lock_delay
+        state.fall_time = fall_time
+        state.lock_timer = lock_timer if flags & LOCK_TIMER else None
+        state.ticks = ticks
+        state.spawn_tick = spawn_tick
+        state.game_over = bool(flags & GAME_OVER)
+        state.events = []
+        state.current_piece = Tetromino(
+            PIECE_NAMES[current_name], current_x, current_y, current_rotation
+        )
+        state.next_piece = Tetromino(
+            PIECE_NAMES[next_name], next_x, next_y, next_rotation
+        )
+        offset = SNAPSHOT.size
+        counts = BLOCK_COUNTS.unpack_from(data, offset)
+        state.block_counts = dict(zip(PIECE_NAMES, counts))
+        state.total_blocks = sum(counts)
+        offset += BLOCK_COUNTS.size
+
+        grid = state.grid = Board(width, height)
+        for y in range(height):
+            colors = grid.colors[y] = bytearray(data[offset : offset + width])
+            offset += width
+            row = 0
+            for x, color_index in enumerate(colors):
+                if color_index:
+                    row |= 1 << x
+            grid.rows[y] = row
+        grid.reindex()
+
+        state.seed = None
+        if flags & SEEDED:
+            (state.seed,) = SEED.unpack_from(data, offset)
+            offset += SEED.size
+        state.rng = PieceRandom(*RNG_STATE.unpack_from(data, offset))
+        return state
+
+    def spawn_piece(self) -> Tetromino:
+        # Choose a random tetromino
+        piece_name = self.rng.choice(PIECE_NAMES)
+        # Update block counts
+        self.block_counts[piece_name] += 1
+        self.total_blocks += 1
+        # Spawn at the top center of the grid
+        x = self.grid.width // 2 - len(TETROMINOES[piece_name]["shape"][0]) // 2
+        return Tetromino(piece_name, x, 0)
+
+    def pop_events(self) -> List[Event]:
+        events = self.events
+        self.events = []
+        return events
+
+    def legal_actions(self) -> List[int]:
+        if self.game_over:
+            return []
+        piece = self.current_piece
+        actions = [NOOP, DOWN, HARD_DROP]
+        if not piece.collides(self.grid, dx=-1):
+            actions.append(LEFT)
+        if not piece.collides(self.grid, dx=1):
+            actions.append(RIGHT)
+        original_rotation = piece.rotation
+        piece.rotate()
+        if not piece.collides(self.grid) or any(
+            not piece.collides(self.grid, dx=dx) for dx in WALL_KICKS
+        ):
+            actions.append(ROTATE)
+        piece.rotation = original_rotation
+        return actions
+
+    def step(self, action: int = NOOP) -> Tuple[int, bool]:
+        # Apply one action and advance one tick; returns (score gained, game over)
+        self.events = []
+        score = self.score
+        self.apply(action)
+        self.tick()
+        return self.score - score, self.game_over
+
+    def apply(self, action: int) -> None:
+        if self.game_over or action == NOOP:
+            return
+        piece = self.current_piece
+        grid = self.grid
+        if action == LEFT or action == RIGHT:
+            dx = -1 if action == LEFT else 1
+            if not piece.collides(grid, dx=dx):
+                piece.move(dx, 0)
+                if piece.collides(grid, dy=1):
+                    self.lock_timer = self.ticks
+        elif action == DOWN:
+            if not piece.collides(grid, dy=1):
+                piece.move(0, 1)
+                self.score += 2  # Award 2 points per line moved down using down arrow
+                self.events.append(("soft_drop", 1))
+            else:
+                # Lock on the next gravity step
+                self.lock_timer = self.ticks - self.lock_delay - 1
+        elif action == HARD_DROP:
+            # Drop to the landing row and lock at once, scoring like a soft
+            # drop of the same distance
+            rows = piece.landing_y(grid) - piece.y
+            piece.move(0, rows)
+            self.score += 2 * rows
+            self.events.append(("hard_drop", rows))
+            self.fall_time = 0
+            self.lock_piece()
+        elif action == ROTATE:
+            original_rotation = piece.rotation
+            piece.rotate()
+            if piece.collides(grid):
+                # Try wall kicks
+                for dx in WALL_KICKS:
+                    if not piece.collides(grid, dx=dx):
+                        piece.move(dx, 0)
+                        if piece.collides(grid, dy=1):
+                            self.lock_timer = self.ticks
+                        break
+                else:
+                    piece.rotation = original_rotation
+
+    def tick(self) -> None:
+        if self.game_over:
+            return
+        self.ticks += 1
+        self.fall_time += 1
+        if self.fall_time < self.fall_speed:
+            return
+        self.fall_time = 0
+        if not self.current_piece.collides(self.grid, dy=1):
+            self.current_piece.move(0, 1)
+            self.lock_timer = None
+            return
+        if self.lock_timer is None:
+            self.lock_timer = self.ticks
+        if self.ticks - self.lock_timer > self.lock_delay:
+            self.lock_piece()
+
+    def lock_piece(self) -> None:
+        self.events.append(("landed", 0))
+        self.lock_timer = None
+        if not self.merge_piece_to_grid():
+            self.end_game()
+            return
+        lines_cleared = self.clear_lines(self.current_piece.row_indices())
+        if lines_cleared > 0:
+            self.events.append(("cleared", lines_cleared))
+            if lines_cleared == 4:
+                self.events.append(("tetris", self.tetris_multiplier))
+            # Speed up every lines_per_cycle lines
+            if (
+                self.total_lines_cleared // self.lines_per_cycle
+                > (self.total_lines_cleared - lines_cleared) // self.lines_per_cycle
+            ):
+                self.fall_speed = max(self.fall_speed - 1, 1)
+                self.events.append(("cycle", 0))
+        piece = self.current_piece
+        self.events.append(
+            (
+                "placed",
+                LockedPiece(
+                    piece.name,
+                    piece.rotation,
+                    piece.x,
+                    piece.y,
+                    lines_cleared,
+                    self.ticks - self.spawn_tick,
+                ),
+            )
+        )
+        self.current_piece = self.next_piece
+        self.spawn_tick = self.ticks
+        self.next_piece = self.spawn_piece()
+        if self.current_piece.collides(self.grid):
+            self.end_game()
+
+    def merge_piece_to_grid(self) -> bool:
+        piece = self.current_piece
+        positions = piece.get_positions()
+        if any(y < 0 for _, y in positions):  # Piece has reached the top
+            return False
+        color_index = piece.color_index
+        for x, y in positions:
+            self.grid.set_cell(x, y, color_index)
+        return True
+
+    def clear_lines(self, rows: Optional[List[int]] = None) -> int:
+        # Only `rows` are checked for being full when given
+        lines_cleared = self.grid.clear_lines(rows)
+        self.total_lines_cleared += lines_cleared
+        if lines_cleared == 1:
+            self.score += 100
+            self.tetris_multiplier = 1
+        elif lines_cleared == 2:
+            self.score += 100 * 2 * 2
+            self.tetris_multiplier = 1
+        elif lines_cleared == 3:
+            self.score += 100 * 3 * 3
+            self.tetris_multiplier = 1
+        elif lines_cleared == 4:
+            self.score += 100 * 4 * 5 * self.tetris_multiplier
+            self.tetris_multiplier += 1
+        return lines_cleared
+
+    def end_game(self) -> None:
+        self.game_over = True
+        self.events.append(("game_over", 0))
@@ -0,0 +1,215 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+# Frames are drawn offscreen
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from engine import GameState, GRID_WIDTH, GRID_HEIGHT, NOOP  # noqa: E402
+from replay import Recording  # noqa: E402
+from selfplay import load_policy  # noqa: E402
+
+# One frame per simulation tick, as main() shows them: the state after the
+# tick, before the inputs recorded for the next one are applied. Each worker
+# gets a range of frames and the snapshot of the state at its first frame,
+# so it only simulates its own range.
+Job = Tuple[bytes, List[Tuple[int, int]], int, int, int, int, str, str]
+
+
+def simulate(seed: int, policy_name: str, max_ticks: int) -> Recording:
+    # Play a game with a self-play policy and record it for export
+    state = GameState(seed)
+    policy = load_policy(policy_name)(seed)
+    recording = Recording(seed)
+    while not state.game_over and state.ticks < max_ticks:
+        action = policy(state)
+        if action != NOOP:
+            recording.record(state.ticks, action)
+        state.step(action)
+    recording.finish(state)
+    return recording
+
+
+def _advance(state: GameState, inputs, index: int) -> int:
+    # Apply the inputs recorded for the current tick, then run the tick;
+    # returns the index of the next input
+    while index < len(inputs) and inputs[index][0] == state.ticks:
+        state.apply(inputs[index][1])
+        index += 1
+    state.tick()
+    state.pop_events()
+    return index
+
+
+def plan_jobs(
+    recording: Recording,
+    start: int,
+    end: int,
+    every: int,
+    chunks: int,
+    fmt: str,
+    out: str,
+) -> List[Job]:
+    # Split the frames at ticks start, start + every, ... up to end (or the
+    # end of the game) into about `chunks` ranges, snapshotting the state at
+    # the start of each
+    state = GameState(recording.seed)
+    inputs = recording.inputs
+    end = min(end, recording.ticks)
+    frames = (end - start) // every + 1
+    per_chunk = max(1, -(-frames // chunks)) * every
+    jobs = []
+    index = 0
+    for first in range(start, end + 1, per_chunk):
+        while state.ticks < first and not state.game_over:
+            index = _advance(state, inputs, index)
+        if state.game_over and state.ticks < first:
+            break
+        last = min(first + per_chunk, end + 1)
+        chunk_inputs = [i for i in inputs[index:] if i[0] < last]
+        frame = (first - start) // every
+        jobs.append(
+            (state.to_bytes(), chunk_inputs, first, last, every, frame, fmt, out)
+        )
+    return jobs
+
+
+def render_range(job: Job) -> Tuple[int, Optional[str]]:
+    # Worker: render one range of frames. PNG frames are saved directly; raw
+    # RGB frames go to a chunk file returned for the parent to join in order.
+    snapshot, inputs, first, last, every, frame, fmt, out = job
+    import pygame
+
+    from renderer import Renderer, WINDOW_WIDTH, WINDOW_HEIGHT
+
+    pygame.display.init()
+    pygame.font.init()
+    surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    renderer = Renderer(surface, GRID_WIDTH, GRID_HEIGHT)
+    state = GameState.from_bytes(snapshot)
+    raw = None
+    if fmt == "raw":
+        fd, chunk_path = tempfile.mkstemp(prefix=f"{first:08d}-", dir=out)
+        raw = os.fdopen(fd, "wb")
+    index = 0
+    count = 0
+    for tick in range(first, last):
+        if state.ticks != tick:
+            break  # Game over before the end of the range
+        if (tick - first) % every == 0:
+            renderer.render(state)
+            if state.game_over:
+                renderer.hud.draw_game_over(surface)
+            if raw:
+                raw.write(pygame.image.tobytes(surface, "RGB"))
+            else:
+                pygame.image.save(surface, os.path.join(out, f"frame_{frame:06d}.png"))
+            frame += 1
+            count += 1
+        if not state.game_over:
+            index = _advance(state, inputs, index)
+    if raw:
+        raw.close()
+        return count, chunk_path
+    return count, None
+
+
+def collect(results, sink) -> int:
+    # Count the frames of render_range() results in order, appending each raw
+    # chunk to sink; returns the total
+    frames = 0
+    for count, chunk_path in results:
+        frames += count
+        if chunk_path:
+            with open(chunk_path, "rb") as chunk:
+                shutil.copyfileobj(chunk, sink)
+            os.remove(chunk_path)
+    return frames
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Render a recorded or simulated game to PNG frames or raw RGB"
+    )
+    parser.add_argument("recording", nargs="?", help="replay file to render")
+    parser.add_argument("--seed", type=int, help="simulate this game instead")
+    parser.add_argument("--policy", default="bot", help="policy for --seed")
+    parser.add_argument("--max-ticks", type=int, default=60 * 60)
+    parser.add_argument(
+        "--out",
+        required=True,
+        help="directory for PNG frames, or file ('-' for stdout) for raw frames",
+    )
+    parser.add_argument("--format", choices=("png", "raw"), default="png")
+    parser.add_argument("--start", type=int, default=0, help="first tick")
+    parser.add_argument("--end", type=int, default=2**32, help="last tick")
+    parser.add_argument("--every", type=int, default=1, help="ticks per frame")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if (args.recording is None) == (args.seed is None):
+        parser.error("give either a recording or --seed")
+    if args.recording:
+        recording = Recording.load(args.recording)
+    else:
+        recording = simulate(args.seed, args.policy, args.max_ticks)
+
+    if args.format == "png":
+        os.makedirs(args.out, exist_ok=True)
+        work_dir = args.out
+    else:
+        out_dir = (
+            os.path.dirname(os.path.abspath(args.out)) if args.out != "-" else None
+        )
+        work_dir = tempfile.mkdtemp(prefix="export-", dir=out_dir)
+
+    start = time.perf_counter()
+    jobs = plan_jobs(
+        recording,
+        args.start,
+        args.end,
+        args.every,
+        max(1, args.workers) * 4,
+        args.format,
+        work_dir,
+    )
+    sink = None
+    if args.format == "raw":
+        sink = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+    try:
+        if args.workers > 1:
+            with Pool(args.workers) as pool:
+                frames = collect(pool.imap(render_range, jobs), sink)
+                # Let the workers exit before the with block terminates
+                # them: SDL catches SIGTERM, so terminate() alone hangs
+                pool.close()
+                pool.join()
+        else:
+            frames = collect(map(render_range, jobs), sink)
+    finally:
+        if sink:
+            sink.flush()
+            if sink is not sys.stdout.buffer:
+                sink.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+
+    from renderer import WINDOW_WIDTH, WINDOW_HEIGHT
+
+    print(
+        f"{frames} frames ({WINDOW_WIDTH}x{WINDOW_HEIGHT} "
+        f"{'rgb24' if args.format == 'raw' else 'png'}) in {elapsed:.2f}s "
+        f"({frames / elapsed:.0f} frames/s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
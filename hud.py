@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import pygame
+
+from engine import GameState
+from pieces import TETROMINOES
+
+WHITE = (255, 255, 255)
+
+Color = Tuple[int, int, int]
+
+
+class TextCache:
+    # Fonts are loaded once per size and rendered text surfaces are kept in a
+    # bounded LRU cache keyed by (string, color, size)
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._fonts: Dict[int, pygame.font.Font] = {}
+        self._surfaces: "OrderedDict[Tuple[str, Color, int], pygame.Surface]"
+        self._surfaces = OrderedDict()
+
+    def font(self, size: int) -> pygame.font.Font:
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text: str, color: Color, size: int) -> pygame.Surface:
+        key = (text, color, size)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = self.font(size).render(text, True, color)
+            self._surfaces[key] = surface
+            if len(self._surfaces) > self.max_size:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surface
+
+
+class Hud:
+    # Sidebar statistics, next-piece label and game over banner. The sidebar
+    # text is only rebuilt when score, lines or block counts change.
+    def __init__(self, text: Optional[TextCache] = None, size: int = 36):
+        self.text = text or TextCache()
+        self.size = size
+        self._stats_key = None
+        self._sidebar: List[pygame.Surface] = []
+
+    def sidebar_surfaces(self, state: GameState) -> List[pygame.Surface]:
+        key = (state.score, state.total_lines_cleared, state.total_blocks)
+        if key == self._stats_key:
+            return self._sidebar
+        self._stats_key = key
+        render = self.text.render
+        # Display score and lines cleared
+        lines = [
+            render(f"Score: {state.score}", WHITE, self.size),
+            render(f"Lines: {state.total_lines_cleared}", WHITE, self.size),
+        ]
+        # Display block counters and percentages with corresponding colors
+        for block, count in state.block_counts.items():
+            percentage = (
+                (count / state.total_blocks * 100) if state.total_blocks > 0 else 0
+            )
+            lines.append(
+                render(
+                    f"{block}: {count} ({percentage:.1f}%)",
+                    TETROMINOES[block]["color"],
+                    self.size,
+                )
+            )
+        self._sidebar = lines
+        return lines
+
+    def sidebar_height(self) -> int:
+        # Bottom of the statistics drawn by draw_sidebar
+        return 80 + 30 * len(TETROMINOES)
+
+    def draw_sidebar(self, surface: pygame.Surface, state: GameState) -> None:
+        score_text, lines_text, *block_texts = self.sidebar_surfaces(state)
+        surface.blit(score_text, (10, 10))
+        surface.blit(lines_text, (10, 40))
+        y_position = 80
+        for block_text in block_texts:
+            surface.blit(block_text, (10, y_position))
+            y_position += 30
+
+    def draw_next_label(self, surface: pygame.Surface, position) -> None:
+        surface.blit(self.text.render("Next:", WHITE, self.size), position)
+
+    def draw_game_over(self, surface: pygame.Surface) -> pygame.Rect:
+        game_over_text = self.text.render("Game Over", WHITE, 74)
+        text_rect = game_over_text.get_rect(center=surface.get_rect().center)
+        surface.blit(game_over_text, text_rect)
+        return text_rect
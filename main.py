@@ -1,540 +1,233 @@
-import pygame
-import sys
-import random
-from pieces import Tetromino, TETROMINOES
+import time
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+IMPORT_START = time.perf_counter()
 
-# Constants
-WINDOW_WIDTH = 800
-WINDOW_HEIGHT = 600
-GRID_SIZE = 30
-GRID_WIDTH = 10
-GRID_HEIGHT = 20
-SIDEBAR_WIDTH = 200
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import random  # noqa: E402
+from bot import Bot  # noqa: E402
+from engine import GameState, GRID_WIDTH, GRID_HEIGHT, TICK_RATE  # noqa: E402
+from engine import NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP  # noqa: E402
+from profiler import FrameProfiler, ProfilerOverlay  # noqa: E402
+from replay import Recording, seed_arg  # noqa: E402
+from telemetry import GameTelemetry, TelemetryWriter  # noqa: E402
 
-# Colors
-BLACK = (0, 0, 0)
-WHITE = (255, 255, 255)
-CYAN = (0, 255, 255)
-YELLOW = (255, 255, 0)
-MAGENTA = (255, 0, 255)
-RED = (255, 0, 0)
-GREEN = (0, 255, 0)
-BLUE = (0, 0, 255)
-ORANGE = (255, 165, 0)
-
-# Set up the display
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Tetris Game")
+# pygame and the modules built on it are imported by main(), and only the
+# subsystems the game uses are initialized there: importing this module stays
+# cheap for tools, and --no-audio never opens the mixer.
 
 # Game variables
-grid = [[BLACK for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-current_piece = None
-next_piece = None
-game_over = False
-clock = pygame.time.Clock()
-fall_time = 0
-fall_speed = 50  # milliseconds
-lock_delay = 5  # milliseconds
-lock_timer = 0
-score = 0
-total_lines_cleared = 0
+state = GameState()
+FPS = 60  # render rate; the simulation always runs at TICK_RATE
+TICK_MS = 1000 / TICK_RATE
+MAX_FRAME_MS = 250  # drop simulation time beyond this after a stall
 key_repeat_delay = 200  # milliseconds before repeat starts
 key_repeat_rate = 50  # milliseconds between repeats
-key_states = {"left": False, "right": False, "down": False}
-key_timers = {"left": 0, "right": 0, "down": 0}
-block_counts = {"I": 0, "O": 0, "T": 0, "S": 0, "Z": 0, "J": 0, "L": 0}
-total_blocks = 0
-lines_per_cycle = 10
-tetris_multiplier = 1
-
-
-def draw_grid():
-    # Draw the grid cells
-    for y in range(GRID_HEIGHT):
-        for x in range(GRID_WIDTH):
-            if grid[y][x] != BLACK:
-                pygame.draw.rect(
-                    screen,
-                    grid[y][x],
-                    (
-                        x * GRID_SIZE + SIDEBAR_WIDTH,
-                        y * GRID_SIZE,
-                        GRID_SIZE,
-                        GRID_SIZE,
-                    ),
-                )
-                pygame.draw.rect(
-                    screen,
-                    WHITE,
-                    (
-                        x * GRID_SIZE + SIDEBAR_WIDTH,
-                        y * GRID_SIZE,
-                        GRID_SIZE,
-                        GRID_SIZE,
-                    ),
-                    1,
-                )
-    # Draw border around the gameplay area
-    pygame.draw.rect(
-        screen,
-        WHITE,
-        (SIDEBAR_WIDTH, 0, GRID_WIDTH * GRID_SIZE, GRID_HEIGHT * GRID_SIZE),
-        2,
+PROFILER_KEY = "f3"
+# pygame key names, resolved with pygame.key.key_code
+KEY_ACTIONS = {
+    "left": LEFT,
+    "right": RIGHT,
+    "down": DOWN,
+    "up": ROTATE,
+    "space": HARD_DROP,
+}
+IMPORT_MS = (time.perf_counter() - IMPORT_START) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vibe Coded Tetris")
+    parser.add_argument("--seed", type=seed_arg, help="seed for the piece sequence")
+    parser.add_argument(
+        "--record", metavar="PATH", help="save a replay of the game to PATH"
     )
-
-
-def draw_sidebar():
-    pygame.draw.rect(screen, BLACK, (0, 0, SIDEBAR_WIDTH, WINDOW_HEIGHT))
-    # Display score and lines cleared
-    font = pygame.font.Font(None, 36)
-    score_text = font.render(f"Score: {score}", True, WHITE)
-    screen.blit(score_text, (10, 10))
-    lines_text = font.render(f"Lines: {total_lines_cleared}", True, WHITE)
-    screen.blit(lines_text, (10, 40))
-
-    # Display block counters and percentages with corresponding colors
-    y_position = 80
-    block_types = ["I", "O", "T", "S", "Z", "J", "L"]
-    for block in block_types:
-        count = block_counts[block]
-        percentage = (count / total_blocks * 100) if total_blocks > 0 else 0
-        block_color = TETROMINOES[block]["color"]
-        block_text = font.render(
-            f"{block}: {count} ({percentage:.1f}%)", True, block_color
-        )
-        screen.blit(block_text, (10, y_position))
-        y_position += 30
-
-
-def draw_next_piece(piece):
-    font = pygame.font.Font(None, 36)
-    next_text = font.render("Next:", True, WHITE)
-    screen.blit(next_text, (510, 10))
-    if piece:
-        shape = piece.shape
-        start_x = 600
-        start_y = 50
-        for r, row in enumerate(shape):
-            for c, cell in enumerate(row):
-                if cell != 0:
-                    pygame.draw.rect(
-                        screen,
-                        piece.color,
-                        (
-                            start_x + c * GRID_SIZE,
-                            start_y + r * GRID_SIZE,
-                            GRID_SIZE,
-                            GRID_SIZE,
-                        ),
-                    )
-                    pygame.draw.rect(
-                        screen,
-                        WHITE,
-                        (
-                            start_x + c * GRID_SIZE,
-                            start_y + r * GRID_SIZE,
-                            GRID_SIZE,
-                            GRID_SIZE,
-                        ),
-                        1,
-                    )
-
-
-def spawn_piece():
-    global total_blocks
-    # Choose a random tetromino
-    piece_name = random.choice(list(TETROMINOES.keys()))
-    # Update block counts
-    block_counts[piece_name] += 1
-    total_blocks += 1
-    # Spawn at the top center of the grid
-    x = GRID_WIDTH // 2 - len(TETROMINOES[piece_name]["shape"][0]) // 2
-    y = 0
-    return Tetromino(piece_name, x, y)
-
-
-def merge_piece_to_grid():
-    global current_piece, grid
-    for x, y in current_piece.get_positions():
-        if y < 0:  # Piece has reached the top
-            return False
-        grid[y][x] = current_piece.color
-    return True
-
-
-def clear_lines():
-    global grid, score, total_lines_cleared, tetris_multiplier
-    lines_cleared = 0
-    y = GRID_HEIGHT - 1
-    while y >= 0:
-        if all(cell != BLACK for cell in grid[y]):
-            lines_cleared += 1
-            del grid[y]
-            grid.insert(0, [BLACK for _ in range(GRID_WIDTH)])
-        else:
-            y -= 1
-    total_lines_cleared += lines_cleared
-    if lines_cleared == 1:
-        score += 100
-        tetris_multiplier = 1
-    elif lines_cleared == 2:
-        score += 100 * 2 * 2
-        tetris_multiplier = 1
-    elif lines_cleared == 3:
-        score += 100 * 3 * 3
-        tetris_multiplier = 1
-    elif lines_cleared == 4:
-        score += 100 * 4 * 5 * tetris_multiplier
-        tetris_multiplier += 1
-    return lines_cleared
-
-
-def draw_current_piece():
-    for x, y in current_piece.get_positions():
-        if y >= 0:  # Only draw parts of the piece that are within the grid
-            pygame.draw.rect(
-                screen,
-                current_piece.color,
-                (
-                    x * GRID_SIZE + SIDEBAR_WIDTH,
-                    y * GRID_SIZE,
-                    GRID_SIZE,
-                    GRID_SIZE,
-                ),
-            )
-            pygame.draw.rect(
-                screen,
-                WHITE,
-                (
-                    x * GRID_SIZE + SIDEBAR_WIDTH,
-                    y * GRID_SIZE,
-                    GRID_SIZE,
-                    GRID_SIZE,
-                ),
-                1,
-            )
-
-
-def main():
-    global current_piece, next_piece, game_over, fall_time, score, lock_timer, fall_speed, tetris_multiplier
-
-    # Synthesize event-based 8-bit chiptune style sound effects
-    import array
-    import math
-
-    def generate_square_wave(frequency, duration, sample_rate=44100, amplitude=0.5):
-        samples = int(sample_rate * duration)
-        data = array.array("h")  # signed short integer samples
-        for i in range(samples):
-            t = float(i) / sample_rate
-            value = int(
-                32760
-                * amplitude
-                * (1 if math.sin(2 * math.pi * frequency * t) >= 0 else -1)
-            )
-            data.append(value)
-        return pygame.mixer.Sound(buffer=data)
-
-    # Define sound effects for different events
-    # Neutral sound for block landing
-    block_land_sound = generate_square_wave(
-        220.00, 0.1, amplitude=0.3
-    )  # A3, short beep
-    # Positive sounds for scoring
-    score_1_point_sound = generate_square_wave(
-        523.25, 0.05, amplitude=0.4
-    )  # C5, quick high note
-    score_100_points_sound = generate_square_wave(
-        659.25, 0.1, amplitude=0.5
-    )  # E5, slightly longer
-    score_tetris_sound = generate_square_wave(
-        783.99, 0.2, amplitude=0.6
-    )  # G5, triumphant longer note
-    # Negative sound for game over
-    game_over_sound = generate_square_wave(
-        130.81, 0.5, amplitude=0.5
-    )  # C3, low and slow
-
-    # Channels for sound effects and background music
-    effect_channel = pygame.mixer.Channel(0)
-    bg_music_channel = pygame.mixer.Channel(1)
-
-    def generate_melody(key="C", num_notes=64):
-        notes = {
-            "C": [261.63, 523.25],
-            "D": [293.66, 587.33],
-            "E": [329.63, 659.25],
-            "F": [349.23, 698.46],
-            "G": [392.00, 783.99],
-            "A": [440.00, 880.00],
-            "B": [493.88, 987.77],
-        }
-        scales = {
-            "C_major_penta": ["C", "D", "E", "G", "A"],
-            "G_major_penta": ["G", "A", "B", "D", "E"],
-            "F_major_penta": ["F", "G", "A", "C", "D"],
-        }
-
-        scale = scales.get(f"{key}_major_penta", scales["C_major_penta"])
-        melody = []
-        for _ in range(num_notes):
-            note_name = random.choice(scale)
-            octave = random.choice([0, 1])
-            frequency = notes[note_name][octave]
-            duration = random.choice([0.1, 0.2, 0.2, 0.3, 0.4])
-            melody.append((frequency, duration))
-        return melody
-
-    bg_melody = generate_melody(random.choice(["C", "F", "G"]))
-
-    # Play the background melody in a loop
-    current_bg_note = 0
-    bg_note_start_time = 0
-
-    def play_next_bg_note():
-        nonlocal current_bg_note, bg_note_start_time
-        if current_bg_note < len(bg_melody):
-            frequency, duration = bg_melody[current_bg_note]
-            note_sound = generate_square_wave(frequency, duration, amplitude=0.2)
-            bg_music_channel.play(note_sound)
-            bg_note_start_time = pygame.time.get_ticks()
-            current_bg_note = (current_bg_note + 1) % len(bg_melody)
-
-    # Start the background music
-    play_next_bg_note()
-
-    if current_piece is None:
-        current_piece = spawn_piece()
-        next_piece = spawn_piece()
-        if current_piece.collides(grid):
-            game_over = True
-
-    game_over_time = 0
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write per-phase frame timings to PATH (.json or .csv) on exit",
+    )
+    parser.add_argument(
+        "--demo", action="store_true", help="let the bot play instead of the keys"
+    )
+    parser.add_argument(
+        "--repeat-delay",
+        type=float,
+        default=key_repeat_delay,
+        help="milliseconds a key is held before it repeats",
+    )
+    parser.add_argument(
+        "--repeat-rate",
+        type=float,
+        default=key_repeat_rate,
+        help="milliseconds between repeats of a held key",
+    )
+    parser.add_argument(
+        "--no-audio", action="store_true", help="run without sound or music"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="draw offscreen without a window or audio (for --demo and --record)",
+    )
+    parser.add_argument(
+        "--fullscreen", action="store_true", help="scale the game to the full screen"
+    )
+    parser.add_argument(
+        "--telemetry",
+        metavar="PATH",
+        help="append per-piece and per-game records to PATH (.jsonl or .db)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    import pygame
+    from audio import AudioWorker
+    from controls import InputDispatcher, KeyRepeat
+    from renderer import Renderer, ScaledDisplay, native_size
+
+    # Set up the display: frames are drawn at native size and scaled to the
+    # window, which can be resized freely
+    pygame.display.init()
+    pygame.font.init()
+    display = ScaledDisplay(native_size(GRID_WIDTH, GRID_HEIGHT), args.fullscreen)
+    screen = display.surface
+    pygame.display.set_caption("Tetris Game")
+    renderer = Renderer(screen, GRID_WIDTH, GRID_HEIGHT)
+    clock = pygame.time.Clock()
+    profiler_key = pygame.key.key_code(PROFILER_KEY)
+
+    seed = args.seed if args.seed is not None else random.randrange(2**32)
+    state.reset(seed)
+    recording = Recording(seed) if args.record else None
+    bot = Bot() if args.demo else None
+
+    # Per-piece and per-game records, written on their own thread
+    writer = telemetry = None
+    if args.telemetry:
+        writer = TelemetryWriter(args.telemetry)
+        writer.start()
+        telemetry = GameTelemetry(writer.post, state, "bot" if bot else "player")
+
+    # Sound effects and background music run on their own thread, which
+    # also opens the mixer and loads the sounds
+    audio = None
+    if not (args.no_audio or args.headless):
+        audio = AudioWorker()
+        audio.start()
+
+    # Key presses are applied at the start of the next simulation tick
+    inputs = InputDispatcher(
+        {pygame.key.key_code(name): action for name, action in KEY_ACTIONS.items()},
+        KeyRepeat(args.repeat_delay, args.repeat_rate),
+    )
+    inputs.enabled = bot is None  # The bot has the controls
+
+    def handle_game_events():
+        events = state.pop_events()
+        if telemetry:
+            telemetry.observe(state, events)
+        if audio:
+            for kind, value in events:
+                audio.post(kind, value)
+
+    handle_game_events()
+
+    accumulator = 0.0
+    # Per-phase frame timings; PROFILER_KEY toggles the on-screen overlay
+    profiler = FrameProfiler()
+    overlay = ProfilerOverlay(profiler, renderer.hud.text, renderer.overlay_rect)
+    # Startup: importing this module, and from the start of that import to
+    # the first frame on screen; both show in the overlay and the --profile
+    # summary
+    profiler.sample("import", IMPORT_MS)
+    first_frame = True
 
     while True:
-        if not game_over:
-            fall_time += clock.get_rawtime()
-            clock.tick()
+        if not state.game_over:
+            accumulator = min(accumulator + clock.tick(FPS), MAX_FRAME_MS)
+            profiler.begin_frame()
 
-            # Handle key events
-            for event in pygame.event.get():
+            # Handle events; game keys are queued for the simulation
+            for event in inputs.poll(pygame.event.get()):
                 if event.type == pygame.QUIT:
-                    game_over = True
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        key_states["left"] = True
-                        key_timers["left"] = pygame.time.get_ticks()
-                        if not current_piece.collides(grid, dx=-1):
-                            current_piece.move(-1, 0)
-                            if current_piece.collides(grid, dy=1):
-                                lock_timer = pygame.time.get_ticks()
-                    if event.key == pygame.K_RIGHT:
-                        key_states["right"] = True
-                        key_timers["right"] = pygame.time.get_ticks()
-                        if not current_piece.collides(grid, dx=1):
-                            current_piece.move(1, 0)
-                            if current_piece.collides(grid, dy=1):
-                                lock_timer = pygame.time.get_ticks()
-                    if event.key == pygame.K_DOWN:
-                        key_states["down"] = True
-                        key_timers["down"] = pygame.time.get_ticks()
-                        if not current_piece.collides(grid, dy=1):
-                            current_piece.move(0, 1)
-                        else:
-                            lock_timer = 1
-                    if event.key == pygame.K_UP:
-                        original_shape = current_piece.shape
-                        current_piece.rotate()
-                        if current_piece.collides(grid):
-                            # Try wall kicks
-                            for dx in [1, -1, 2, -2]:
-                                if not current_piece.collides(grid, dx=dx):
-                                    current_piece.move(dx, 0)
-                                    if current_piece.collides(grid, dy=1):
-                                        lock_timer = pygame.time.get_ticks()
-                                    break
-                            else:
-                                current_piece.shape = original_shape
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT:
-                        key_states["left"] = False
-                    if event.key == pygame.K_RIGHT:
-                        key_states["right"] = False
-                    if event.key == pygame.K_DOWN:
-                        key_states["down"] = False
-
-            # Handle background music timing
-            current_time = pygame.time.get_ticks()
-            if bg_note_start_time > 0 and current_time - bg_note_start_time >= (
-                bg_melody[(current_bg_note - 1) % len(bg_melody)][1] * 1000
-            ):
-                play_next_bg_note()
-
-            # Handle key repeat
-            for direction in ["left", "right", "down"]:
-                if key_states[direction]:
-                    elapsed = current_time - key_timers[direction]
-                    if elapsed >= key_repeat_delay:
-                        if (elapsed - key_repeat_delay) >= key_repeat_rate:
-                            if direction == "left" and not current_piece.collides(
-                                grid, dx=-1
-                            ):
-                                current_piece.move(-1, 0)
-                            elif direction == "right" and not current_piece.collides(
-                                grid, dx=1
-                            ):
-                                current_piece.move(1, 0)
-                        elif direction == "down" and not current_piece.collides(
-                            grid, dy=1
-                        ):
-                            current_piece.move(0, 1)
-                            score += (
-                                2  # Award 2 points per line moved down using down arrow
-                            )
-                            effect_channel.play(
-                                score_1_point_sound
-                            )  # Play 1 point score sound
-                            key_timers[direction] = current_time - (
-                                (elapsed - key_repeat_delay) % key_repeat_rate
-                            )
-
-            if fall_time >= fall_speed:
-                if not current_piece.collides(grid, dy=1):
-                    current_piece.move(0, 1)
-                    lock_timer = 0
+                    state.end_game()
+                elif event.type == pygame.KEYDOWN and event.key == profiler_key:
+                    overlay.toggle()
+                    renderer.invalidate()
                 else:
-                    if lock_timer == 0:
-                        lock_timer = pygame.time.get_ticks()
-                    if pygame.time.get_ticks() - lock_timer > lock_delay:
-                        effect_channel.play(
-                            block_land_sound
-                        )  # Play block landing sound
-                        if not merge_piece_to_grid():
-                            game_over = True
-                            game_over_time = pygame.time.get_ticks()
-                            effect_channel.play(game_over_sound)  # Play game over sound
-                        lines_cleared = clear_lines()
-                        if lines_cleared > 0:
-                            for i in range(lines_cleared):
-                                score_100_points_sound.play()
-                                pygame.time.wait(100)
-                            if lines_cleared == 4:
-                                for i in range(tetris_multiplier):
-                                    score_tetris_sound.play()
-
-                            # Change song every lines_per_cycle lines
-                            if (
-                                total_lines_cleared // lines_per_cycle
-                                > (total_lines_cleared - lines_cleared)
-                                // lines_per_cycle
-                            ):
-                                bg_melody = generate_melody(
-                                    random.choice(["C", "F", "G"])
-                                )
-                                current_bg_note = 0
-                                play_next_bg_note()
-                                fall_speed -= 2.5  # Increase falling speed by 5ms every lines_per_cycle lines
-                        current_piece = next_piece
-                        next_piece = spawn_piece()
-                        if current_piece.collides(grid):
-                            game_over = True
-                            game_over_time = pygame.time.get_ticks()
-                            effect_channel.play(game_over_sound)  # Play game over sound
-                        lock_timer = 0
-                fall_time = 0
-
-            # Handle custom events for music and input
-            for event in pygame.event.get():
-                if event.type == pygame.USEREVENT + 2:
-                    play_next_bg_note()
-                elif event.type == pygame.QUIT:
-                    game_over = True
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        key_states["left"] = True
-                        key_timers["left"] = pygame.time.get_ticks()
-                        if not current_piece.collides(grid, dx=-1):
-                            current_piece.move(-1, 0)
-                            if current_piece.collides(grid, dy=1):
-                                lock_timer = pygame.time.get_ticks()
-                    elif event.key == pygame.K_RIGHT:
-                        key_states["right"] = True
-                        key_timers["right"] = pygame.time.get_ticks()
-                        if not current_piece.collides(grid, dx=1):
-                            current_piece.move(1, 0)
-                            if current_piece.collides(grid, dy=1):
-                                lock_timer = pygame.time.get_ticks()
-                    elif event.key == pygame.K_DOWN:
-                        key_states["down"] = True
-                        key_timers["down"] = pygame.time.get_ticks()
-                        if not current_piece.collides(grid, dy=1):
-                            current_piece.move(0, 1)
-                            score += (
-                                2  # Award 2 points per line moved down using down arrow
-                            )
-                            effect_channel.play(
-                                score_1_point_sound
-                            )  # Play 1 point score sound
-                        else:
-                            lock_timer = 1
-                    elif event.key == pygame.K_UP:
-                        original_shape = current_piece.shape
-                        current_piece.rotate()
-                        if current_piece.collides(grid):
-                            # Try wall kicks
-                            for dx in [1, -1, 2, -2]:
-                                if not current_piece.collides(grid, dx=dx):
-                                    current_piece.move(dx, 0)
-                                    if current_piece.collides(grid, dy=1):
-                                        lock_timer = pygame.time.get_ticks()
-                                    break
-                            else:
-                                current_piece.shape = original_shape
-                elif event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT:
-                        key_states["left"] = False
-                    elif event.key == pygame.K_RIGHT:
-                        key_states["right"] = False
-                    elif event.key == pygame.K_DOWN:
-                        key_states["down"] = False
-
-            # Drawing
-            screen.fill(BLACK)
-            draw_sidebar()
-            draw_grid()
-            draw_current_piece()
-            draw_next_piece(next_piece)
-            pygame.display.flip()
-            clock.tick(60)
+                    display.handle_event(event)
+            profiler.mark("events")
+
+            # Fixed-timestep simulation: input, key repeat, gravity and lock
+            # delay advance in whole ticks regardless of the frame rate
+            while accumulator >= TICK_MS and not state.game_over:
+                accumulator -= TICK_MS
+                if bot:
+                    action = bot.act(state)
+                    actions = [action] if action != NOOP else []
+                    profiler.mark("bot")
+                else:
+                    actions = inputs.tick()
+                    profiler.mark("input")
+                for action in actions:
+                    if recording:
+                        recording.record(state.ticks, action)
+                    state.apply(action)
+                state.tick()
+                profiler.mark("gravity")
+                handle_game_events()
+                profiler.mark("sound")
+
+            handle_game_events()  # From end_game() on quit
+
+            # Drawing: only the regions that changed are pushed to the display
+            dirty = renderer.render(state)
+            if overlay.visible:
+                dirty.append(overlay.draw(screen))
+            profiler.mark("draw")
+            display.present(dirty)
+            profiler.mark("flip")
+            if first_frame:
+                first_frame = False
+                profiler.sample("startup", (time.perf_counter() - IMPORT_START) * 1000)
+            for latency in inputs.displayed():
+                profiler.sample("latency", latency)
+            profiler.end_frame()
         else:
             # Display Game Over message
-            font = pygame.font.Font(None, 74)
-            game_over_text = font.render("Game Over", True, WHITE)
-            text_rect = game_over_text.get_rect(
-                center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
-            )
-            screen.blit(game_over_text, text_rect)
-            pygame.display.flip()
+            renderer.hud.draw_game_over(screen)
+            display.present()
+            if args.headless:
+                break  # Nobody can dismiss it: end once it has been drawn
 
             exit_game = False
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     exit_game = True
                 elif event.type == pygame.KEYDOWN:
-                    if event.key in (pygame.K_RETURN, pygame.K_ESCAPE, pygame.K_SPACE):
+                    if event.key in (pygame.K_RETURN, pygame.K_ESCAPE):
                         exit_game = True
+                else:
+                    display.handle_event(event)
 
             if exit_game:
                 break
 
-            clock.tick(60)
+            clock.tick(FPS)
+
+    if recording:
+        recording.finish(state)
+        recording.save(args.record)
+    if args.profile:
+        profiler.export(args.profile)
+    if telemetry:
+        telemetry.finish(state)
+        writer.stop()
 
-    effect_channel.stop()  # Stop sound effects when game ends
-    bg_music_channel.stop()  # Stop background music when game ends
+    if audio:
+        audio.stop()  # Stops the sound effects and background music
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,244 @@
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from board import Board
+from engine import GameState, GRID_WIDTH, GRID_HEIGHT, PIECE_NAMES, WALL_KICKS
+from pieces import Tetromino, TETROMINOES, COLOR_INDEX
+
+CHUNKS = 64  # jobs per level when expanding in worker processes
+# Known-good board counts, each matched by the bot's own placement search
+# (bot.search): (stack rows at the bottom of an empty GRID_WIDTH x GRID_HEIGHT
+# board, in load_board()'s format; piece sequence; distinct boards after each
+# piece). Pieces clear lines in the second. Checked by --check and the perft
+# benchmark.
+REFERENCES = (
+    ((), "TIO", (34, 596, 5542)),
+    (
+        ("#####.####", "#####.####", "##.#######", "#####.####", ".##.######"),
+        "ITO",
+        (17, 578, 5314),
+    ),
+)
+
+# Perft: the number of distinct boards reachable after k pieces of a fixed
+# sequence. Placements are enumerated with Tetromino.collides and locked with
+# Board.set_cell and Board.clear_lines, so the counts change if any of those
+# do. A board is identified by its palette bytes, which also fix occupancy.
+
+
+def board_key(board: Board) -> bytes:
+    return b"".join(board.colors)
+
+
+def board_from_key(key: bytes, width: int, height: int) -> Board:
+    board = Board(width, height)
+    for y in range(height):
+        colors = bytearray(key[y * width : (y + 1) * width])
+        board.colors[y] = colors
+        board.rows[y] = sum(1 << x for x, index in enumerate(colors) if index)
+    board.reindex()
+    return board
+
+
+def placements(board: Board, name: str) -> List[Board]:
+    # Every board left by locking the piece wherever it can come to rest from
+    # its spawn position, moving as GameState.apply allows; empty when the
+    # spawn position is blocked (game over)
+    x = board.width // 2 - len(TETROMINOES[name]["shape"][0]) // 2
+    piece = Tetromino(name, x, 0)
+    if piece.collides(board):
+        return []
+    start = (0, x, 0)
+    seen = {start}
+    stack = [start]
+    results = []
+    while stack:
+        rotation, x, y = stack.pop()
+        piece.rotation, piece.x, piece.y = rotation, x, y
+        moves = []
+        if not piece.collides(board, dx=-1):
+            moves.append((rotation, x - 1, y))
+        if not piece.collides(board, dx=1):
+            moves.append((rotation, x + 1, y))
+        if not piece.collides(board, dy=1):
+            moves.append((rotation, x, y + 1))
+        else:
+            result = board.copy()
+            for cell_x, cell_y in piece.get_positions():
+                result.set_cell(cell_x, cell_y, piece.color_index)
+            result.clear_lines()
+            results.append(result)
+        piece.rotate()
+        if not piece.collides(board):
+            moves.append((piece.rotation, x, y))
+        else:
+            # Try wall kicks
+            for dx in WALL_KICKS:
+                if not piece.collides(board, dx=dx):
+                    moves.append((piece.rotation, x + dx, y))
+                    break
+        for state in moves:
+            if state not in seen:
+                seen.add(state)
+                stack.append(state)
+    return results
+
+
+def expand(
+    keys: Iterable[bytes], name: str, width: int, height: int
+) -> Tuple[Set[bytes], int]:
+    # Distinct child boards of a batch of boards, and the number of
+    # placements (edges) that produced them
+    children = set()
+    edges = 0
+    for key in keys:
+        for child in placements(board_from_key(key, width, height), name):
+            children.add(board_key(child))
+            edges += 1
+    return children, edges
+
+
+def _expand(args) -> Tuple[Set[bytes], int]:
+    return expand(*args)
+
+
+def perft(
+    board: Board, sequence: str, depth: int, pool: Optional[Pool] = None
+) -> List[Tuple[int, int]]:
+    # (distinct boards, placements) after each of the first `depth` pieces.
+    # Each level is deduplicated before it is expanded, so a board reached
+    # along several paths is only searched once; with a pool the level is
+    # split into chunks that are expanded in the worker processes.
+    width, height = board.width, board.height
+    level = {board_key(board)}
+    counts = []
+    for name in sequence[:depth]:
+        keys = list(level)
+        if pool is None:
+            level, edges = expand(keys, name, width, height)
+        else:
+            chunk = max(1, len(keys) // CHUNKS)
+            jobs = [
+                (keys[i : i + chunk], name, width, height)
+                for i in range(0, len(keys), chunk)
+            ]
+            level = set()
+            edges = 0
+            for children, count in pool.imap_unordered(_expand, jobs):
+                level |= children
+                edges += count
+        counts.append((len(level), edges))
+    return counts
+
+
+def seeded_sequence(seed: int, length: int) -> str:
+    # The pieces GameState(seed) deals, in order
+    state = GameState(seed)
+    names = [state.current_piece.name, state.next_piece.name]
+    while len(names) < length:
+        names.append(state.spawn_piece().name)
+    return "".join(names[:length])
+
+
+def parse_board(lines: Sequence[str], width: int, height: int) -> Board:
+    # One line per row, "." for empty and a piece letter or "#" for filled,
+    # placed at the bottom of an empty board
+    board = Board(width, height)
+    for y, line in enumerate(lines, height - len(lines)):
+        for x, char in enumerate(line):
+            if char != ".":
+                board.set_cell(x, y, COLOR_INDEX.get(char, 1))
+    return board
+
+
+def load_board(path: str) -> Board:
+    # A parse_board() text file, as tall and wide as its lines
+    with open(path) as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    return parse_board(lines, len(lines[0]), len(lines))
+
+
+def reference_mismatches(pool: Optional[Pool] = None) -> List[str]:
+    # One message per REFERENCES entry whose counts have changed
+    mismatches = []
+    for rows, sequence, expected in REFERENCES:
+        board = parse_board(rows, GRID_WIDTH, GRID_HEIGHT)
+        counts = perft(board, sequence, len(sequence), pool)
+        actual = tuple(boards for boards, _ in counts)
+        if actual != expected:
+            mismatches.append(
+                f"{sequence} from {len(rows)} stack rows: "
+                f"expected {expected}, got {actual}"
+            )
+    return mismatches
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Count the distinct boards reachable after each piece"
+    )
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument(
+        "--pieces", help="piece sequence such as TIOSZ (default: from --seed)"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", metavar="PATH", help="starting board text file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--expect",
+        help="comma-separated board counts per depth; exit 1 on a mismatch",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="count the reference vectors and exit 1 if any count has changed",
+    )
+    args = parser.parse_args(argv)
+
+    if args.check:
+        if args.pieces or args.board or args.expect:
+            parser.error("--check runs the reference vectors on their own")
+        if args.workers > 1:
+            with Pool(args.workers) as pool:
+                mismatches = reference_mismatches(pool)
+        else:
+            mismatches = reference_mismatches()
+        for mismatch in mismatches:
+            print(f"MISMATCH: {mismatch}")
+        print(f"{len(REFERENCES) - len(mismatches)}/{len(REFERENCES)} references ok")
+        return 1 if mismatches else 0
+
+    sequence = args.pieces or seeded_sequence(args.seed, args.depth)
+    if len(sequence) < args.depth or any(c not in PIECE_NAMES for c in sequence):
+        parser.error(f"need {args.depth} pieces from {''.join(PIECE_NAMES)}")
+    board = load_board(args.board) if args.board else Board(GRID_WIDTH, GRID_HEIGHT)
+    start = time.perf_counter()
+    if args.workers > 1:
+        with Pool(args.workers) as pool:
+            counts = perft(board, sequence, args.depth, pool)
+    else:
+        counts = perft(board, sequence, args.depth)
+    elapsed = time.perf_counter() - start
+
+    total = 0
+    for depth, (boards, edges) in enumerate(counts, 1):
+        total += edges
+        print(
+            f"depth {depth} {sequence[depth - 1]}: {boards} boards, {edges} placements"
+        )
+    print(f"{total} placements in {elapsed:.2f}s ({total / elapsed:.0f}/s)")
+    if args.expect:
+        expected = [int(count) for count in args.expect.split(",")]
+        actual = [boards for boards, _ in counts]
+        if actual[: len(expected)] != expected:
+            print(f"MISMATCH: expected {expected}, got {actual[: len(expected)]}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
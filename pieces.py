@@ -1,4 +1,7 @@
-from typing import List, Tuple
+from typing import TYPE_CHECKING, List, Tuple
+
+if TYPE_CHECKING:
+    from board import Board
 
 # Colors from main.py
 BLACK = (0, 0, 0)
@@ -24,44 +27,147 @@ TETROMINOES = {
     "L": {"shape": [[0, 0, 0], [0, 0, 7], [7, 7, 7]], "color": ORANGE},
 }
 
+# Board color layer palette, indexed by the cell values used in the shapes above
+PALETTE = [BLACK, CYAN, YELLOW, MAGENTA, GREEN, RED, BLUE, ORANGE]
+
+
+def shape_row_masks(shape: List[List[int]]) -> Tuple[int, int, List[Tuple[int, int]]]:
+    # Returns (leftmost column, rightmost column, [(row, mask)]) for the filled
+    # rows of a shape, with each mask shifted so the leftmost column is bit 0
+    columns = [x for row in shape for x, cell in enumerate(row) if cell != 0]
+    left = min(columns)
+    right = max(columns)
+    masks = []
+    for y, row in enumerate(shape):
+        mask = 0
+        for x, cell in enumerate(row):
+            if cell != 0:
+                mask |= 1 << (x - left)
+        if mask:
+            masks.append((y, mask))
+    return left, right, masks
+
+
+def bottom_profile(shape: List[List[int]]) -> Tuple[Tuple[int, int], ...]:
+    # (column, lowest filled row) for every filled column of a shape
+    profile = {}
+    for y, row in enumerate(shape):
+        for x, cell in enumerate(row):
+            if cell != 0:
+                profile[x] = y
+    return tuple(sorted(profile.items()))
+
+
+def _build_rotation_tables():
+    shapes, offsets, masks, bottoms = {}, {}, {}, {}
+    for name, tetromino in TETROMINOES.items():
+        shape = [list(row) for row in tetromino["shape"]]
+        states = []
+        for _ in range(4):
+            states.append(shape)
+            # Rotate the shape 90 degrees clockwise
+            shape = [list(row) for row in zip(*shape[::-1])]
+        shapes[name] = tuple(states)
+        offsets[name] = tuple(
+            tuple(
+                (x, y)
+                for y, row in enumerate(state)
+                for x, cell in enumerate(row)
+                if cell != 0
+            )
+            for state in states
+        )
+        masks[name] = tuple(
+            (left, right, tuple(row_masks))
+            for left, right, row_masks in map(shape_row_masks, states)
+        )
+        bottoms[name] = tuple(map(bottom_profile, states))
+    return shapes, offsets, masks, bottoms
+
+
+# Every rotation state of every tetromino, computed once at import and indexed
+# by [name][rotation]: the shape matrix, the filled (x, y) cell offsets, the
+# (leftmost column, rightmost column, ((row, mask), ...)) collision masks and
+# the ((column, lowest row), ...) bottom profile
+ROTATIONS, CELL_OFFSETS, ROW_MASKS, BOTTOMS = _build_rotation_tables()
+COLOR_INDEX = {name: PALETTE.index(t["color"]) for name, t in TETROMINOES.items()}
+
 
 class Tetromino:
-    def __init__(self, name: str, x: int, y: int):
+    __slots__ = ("name", "rotation", "x", "y")
+
+    def __init__(self, name: str, x: int, y: int, rotation: int = 0):
         self.name = name
-        self.shape = TETROMINOES[name]["shape"]
-        self.color = TETROMINOES[name]["color"]
+        self.rotation = rotation  # Index into ROTATIONS[name]
         self.x = x  # Top-left corner x position on the grid
         self.y = y  # Top-left corner y position on the grid
 
+    @property
+    def shape(self) -> List[List[int]]:
+        return ROTATIONS[self.name][self.rotation]
+
+    @property
+    def color(self) -> Tuple[int, int, int]:
+        return TETROMINOES[self.name]["color"]
+
+    @property
+    def color_index(self) -> int:
+        return COLOR_INDEX[self.name]
+
+    @property
+    def offsets(self) -> Tuple[Tuple[int, int], ...]:
+        return CELL_OFFSETS[self.name][self.rotation]
+
     def move(self, dx: int, dy: int) -> None:
         self.x += dx
         self.y += dy
 
     def rotate(self) -> None:
         # Rotate the shape 90 degrees clockwise
-        self.shape = [list(row) for row in zip(*self.shape[::-1])]
+        self.rotation = (self.rotation + 1) & 3
 
     def get_positions(self) -> List[Tuple[int, int]]:
-        positions = []
-        for y, row in enumerate(self.shape):
-            for x, cell in enumerate(row):
-                if cell != 0:
-                    positions.append((self.x + x, self.y + y))
-        return positions
-
-    def collides(
-        self, grid: List[List[Tuple[int, int, int]]], dx: int = 0, dy: int = 0
-    ) -> bool:
-        grid_width = len(grid[0])
-        grid_height = len(grid)
-        for x, y in self.get_positions():
-            new_x = x + dx
-            new_y = y + dy
-            if (
-                new_x < 0
-                or new_x >= grid_width
-                or new_y >= grid_height
-                or (new_y >= 0 and grid[new_y][new_x] != BLACK)
-            ):
+        px = self.x
+        py = self.y
+        return [(px + x, py + y) for x, y in CELL_OFFSETS[self.name][self.rotation]]
+
+    def row_indices(self) -> List[int]:
+        # Board rows the piece covers
+        return [self.y + r for r, _ in ROW_MASKS[self.name][self.rotation][2]]
+
+    def landing_y(self, board: "Board") -> int:
+        # The y the piece comes to rest at when dropped straight down. While
+        # the piece is above the surface of every column it covers this is
+        # one pass over its bottom profile against board.column_tops; a piece
+        # tucked under an overhang is stepped down with collides() instead.
+        x = self.x
+        y = self.y
+        column_tops = board.column_tops
+        landing = board.height
+        for column, bottom in BOTTOMS[self.name][self.rotation]:
+            rest = column_tops[x + column] - 1 - bottom
+            if rest < y:
+                drop = 0
+                while not self.collides(board, dy=drop + 1):
+                    drop += 1
+                return y + drop
+            if rest < landing:
+                landing = rest
+        return landing
+
+    def collides(self, board: "Board", dx: int = 0, dy: int = 0) -> bool:
+        left, right, masks = ROW_MASKS[self.name][self.rotation]
+        x = self.x + dx
+        if x + left < 0 or x + right >= board.width:
+            return True
+        y = self.y + dy
+        shift = x + left
+        rows = board.rows
+        height = board.height
+        for r, mask in masks:
+            row_y = y + r
+            if row_y >= height:
+                return True
+            if row_y >= 0 and rows[row_y] & (mask << shift):
                 return True
         return False
@@ -0,0 +1,149 @@
+import csv
+import json
+import time
+from collections import deque
+from typing import Deque, Dict, List, Set
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Linear interpolation between the closest ranks
+    if not sorted_values:
+        return 0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        k - lower
+    )
+
+
+class FrameProfiler:
+    # Times the phases of each frame with mark(name), which charges the time
+    # since the previous mark to that phase. The last `window` frames of every
+    # phase are kept for rolling percentiles and export.
+    def __init__(self, window: int = 600, clock=time.perf_counter):
+        self.window = window
+        self.clock = clock
+        self.phases: Dict[str, Deque[float]] = {}
+        self.frames: Deque[Dict[str, float]] = deque(maxlen=window)
+        self.frame_count = 0
+        self.series: Set[str] = set()  # names fed by sample(), not per frame
+        self._current: Dict[str, float] = {}
+        self._last = 0.0
+        self._frame_start = 0.0
+
+    def begin_frame(self) -> None:
+        self._current = {}
+        self._frame_start = self._last = self.clock()
+
+    def mark(self, phase: str) -> None:
+        now = self.clock()
+        self._current[phase] = self._current.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def _append(self, name: str, ms: float) -> None:
+        samples = self.phases.get(name)
+        if samples is None:
+            samples = self.phases[name] = deque(maxlen=self.window)
+        samples.append(ms)
+
+    def end_frame(self) -> None:
+        frame = {name: seconds * 1000 for name, seconds in self._current.items()}
+        frame["total"] = (self._last - self._frame_start) * 1000
+        for name, ms in frame.items():
+            self._append(name, ms)
+        self.frames.append(frame)
+        self.frame_count += 1
+
+    def sample(self, name: str, ms: float) -> None:
+        # A measurement that is not a frame phase, such as input latency; it
+        # gets percentiles like the phases but no column in the CSV export
+        self.series.add(name)
+        self._append(name, ms)
+
+    def phase_names(self) -> List[str]:
+        # In order of first use, with the frame total last
+        return [name for name in self.phases if name != "total"] + ["total"]
+
+    def percentiles(self, phase: str) -> Dict[str, float]:
+        samples = sorted(self.phases.get(phase, ()))
+        return {f"p{p}": percentile(samples, p) for p in PERCENTILES}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        # Rolling p50/p95/p99 and max in milliseconds for every phase
+        summary = {}
+        for name in self.phase_names() if self.phases else ():
+            summary[name] = self.percentiles(name)
+            summary[name]["max"] = max(self.phases[name])
+        return summary
+
+    def overlay_lines(self) -> List[str]:
+        lines = ["phase     p50/p95/p99 ms"]
+        for name, values in self.summary().items():
+            lines.append(
+                f"{name[:9]:9} {values['p50']:.2f}/{values['p95']:.2f}"
+                f"/{values['p99']:.2f}"
+            )
+        return lines
+
+    def export(self, path: str) -> None:
+        # CSV gets one row per frame; anything else gets a JSON summary plus
+        # the per-frame samples
+        phases = self.phase_names() if self.phases else []
+        if path.endswith(".csv"):
+            phases = [name for name in phases if name not in self.series]
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame"] + phases)
+                first = self.frame_count - len(self.frames)
+                for index, frame in enumerate(self.frames, first):
+                    writer.writerow([index] + [frame.get(name, 0.0) for name in phases])
+        else:
+            with open(path, "w") as f:
+                json.dump(
+                    {
+                        "frames": self.frame_count,
+                        "window": len(self.frames),
+                        "summary": self.summary(),
+                        "samples": list(self.frames),
+                    },
+                    f,
+                    indent=2,
+                )
+
+
+class ProfilerOverlay:
+    # On-screen table of the profiler percentiles drawn into a fixed box. The
+    # text is refreshed every `refresh` frames so it stays readable and mostly
+    # hits the text cache.
+    def __init__(self, profiler: FrameProfiler, text, rect, refresh: int = 30):
+        self.profiler = profiler
+        self.text = text
+        self.rect = rect
+        self.refresh = refresh
+        self.visible = False
+        self._surfaces = []
+        self._updated = -refresh
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        self._updated = -self.refresh
+
+    def draw(self, surface, color=(255, 255, 255), size: int = 20):
+        # Returns the rect drawn, for display.update()
+        if self.profiler.frame_count - self._updated >= self.refresh:
+            self._updated = self.profiler.frame_count
+            self._surfaces = [
+                self.text.render(line, color, size)
+                for line in self.profiler.overlay_lines()
+            ]
+        rect = surface.fill((0, 0, 0), self.rect)
+        x, y = rect.topleft
+        for line in self._surfaces:
+            if y + line.get_height() > rect.bottom:
+                break
+            surface.blit(line, (x, y))
+            y += line.get_height()
+        return rect
@@ -0,0 +1,306 @@
+from typing import List, Optional, Sequence, Tuple
+
+import pygame
+
+from engine import GameState, GRID_WIDTH, GRID_HEIGHT
+from hud import Hud
+from pieces import PALETTE, Tetromino
+
+# Layout in native pixels: the sidebar, the playfield and the next-piece
+# panel side by side. Frames are drawn at this size and scaled to the window.
+GRID_SIZE = 30
+SIDEBAR_WIDTH = 200
+NEXT_PANEL_WIDTH = 300
+PADDING = 10
+NEXT_PIECE_TOP = 50
+MIN_HEIGHT = 480  # room for the sidebar statistics and the profiler overlay
+
+
+def native_size(grid_width: int, grid_height: int) -> Tuple[int, int]:
+    # Size of the frame for a board of grid_width x grid_height cells
+    return (
+        SIDEBAR_WIDTH + grid_width * GRID_SIZE + NEXT_PANEL_WIDTH,
+        max(grid_height * GRID_SIZE, MIN_HEIGHT),
+    )
+
+
+WINDOW_WIDTH, WINDOW_HEIGHT = native_size(GRID_WIDTH, GRID_HEIGHT)
+
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+
+
+def make_block_sprite(color, size: int = GRID_SIZE) -> pygame.Surface:
+    # One grid cell: filled with the block color and outlined in white
+    sprite = pygame.Surface((size, size))
+    sprite.fill(color)
+    pygame.draw.rect(sprite, WHITE, sprite.get_rect(), 1)
+    return sprite
+
+
+def make_ghost_sprite(color, size: int = GRID_SIZE) -> pygame.Surface:
+    # The landing preview of a cell: an outline in the block color
+    sprite = pygame.Surface((size, size))
+    sprite.fill(BLACK)
+    pygame.draw.rect(sprite, color, sprite.get_rect(), 2)
+    return sprite
+
+
+class Renderer:
+    # Retained-mode drawing of a GameState. Block sprites are pre-rendered once
+    # per color, locked cells live in a cached playfield surface refreshed only
+    # when the board changes, and render() returns just the screen rectangles
+    # that changed so they can be pushed with pygame.display.update(rects).
+    def __init__(self, screen: pygame.Surface, grid_width: int, grid_height: int):
+        self.screen = screen
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.field_rect = pygame.Rect(
+            SIDEBAR_WIDTH, 0, grid_width * GRID_SIZE, grid_height * GRID_SIZE
+        )
+        self.sidebar_rect = pygame.Rect(0, 0, SIDEBAR_WIDTH, screen.get_height())
+        self.next_rect = pygame.Rect(
+            self.field_rect.right,
+            0,
+            screen.get_width() - self.field_rect.right,
+            NEXT_PIECE_TOP + 4 * GRID_SIZE,
+        )
+        self.next_text_position = (self.next_rect.x + PADDING, PADDING)
+        # The 4x4 box of the next piece, centered in its panel
+        self.next_piece_position = (
+            self.next_rect.centerx - 2 * GRID_SIZE,
+            NEXT_PIECE_TOP,
+        )
+        self.sprites = [None] + [make_block_sprite(color) for color in PALETTE[1:]]
+        self.ghost_sprites = [None] + [
+            make_ghost_sprite(color) for color in PALETTE[1:]
+        ]
+        self.show_ghost = True  # Outline where the current piece would land
+        self.locked = pygame.Surface(self.field_rect.size)
+        self.hud = Hud()
+        # Below the sidebar statistics, for the profiler overlay
+        self.overlay_rect = pygame.Rect(
+            PADDING // 2,
+            self.hud.sidebar_height() + 2 * PADDING,
+            SIDEBAR_WIDTH - PADDING,
+            160,
+        )
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        # Force a full redraw on the next render()
+        self._full_redraw = True
+        self._locked_colors: Optional[List[bytearray]] = None
+        self._board = None
+        self._board_version = -1
+        self._piece_key = None
+        self._piece_rect: Optional[pygame.Rect] = None
+        self._sidebar_key = None
+        self._next_key = None
+
+    def _sync_locked(self, state: GameState) -> bool:
+        # Redraw the rows of the locked-cell cache that differ from the board
+        grid = state.grid
+        if grid is self._board and grid.version == self._board_version:
+            return False
+        if grid is not self._board:
+            self._board = grid
+            self._locked_colors = None
+        self._board_version = grid.version
+        if self._locked_colors is None:
+            self._locked_colors = [bytearray(grid.width) for _ in range(grid.height)]
+            self.locked.fill(BLACK)
+        for y, colors in enumerate(grid.colors):
+            if colors == self._locked_colors[y]:
+                continue
+            row_rect = (0, y * GRID_SIZE, self.field_rect.width, GRID_SIZE)
+            self.locked.fill(BLACK, row_rect)
+            for x, color_index in enumerate(colors):
+                if color_index:
+                    self.locked.blit(
+                        self.sprites[color_index], (x * GRID_SIZE, y * GRID_SIZE)
+                    )
+            self._locked_colors[y][:] = colors
+        # Draw border around the gameplay area
+        pygame.draw.rect(self.locked, WHITE, self.locked.get_rect(), 2)
+        return True
+
+    def piece_rect(self, piece: Tetromino) -> Optional[pygame.Rect]:
+        # Screen area covered by the visible cells of a piece
+        left, top = self.field_rect.topleft
+        rects = [
+            pygame.Rect(left + x * GRID_SIZE, top + y * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+            for x, y in piece.get_positions()
+            if y >= 0
+        ]
+        return rects[0].unionall(rects[1:]) if rects else None
+
+    def ghost_piece(self, state: GameState) -> Optional[Tetromino]:
+        # The current piece at its landing row, or None when hidden or when
+        # the piece is already resting
+        piece = state.current_piece
+        if not self.show_ghost or state.game_over:
+            return None
+        y = piece.landing_y(state.grid)
+        if y == piece.y:
+            return None
+        return Tetromino(piece.name, piece.x, y, piece.rotation)
+
+    def _piece_area(self, state: GameState) -> Optional[pygame.Rect]:
+        # Screen area of the current piece and its ghost
+        rect = self.piece_rect(state.current_piece)
+        ghost = self.ghost_piece(state)
+        ghost_rect = ghost and self.piece_rect(ghost)
+        if rect and ghost_rect:
+            return rect.union(ghost_rect)
+        return rect or ghost_rect
+
+    def draw_grid(self, state: GameState) -> None:
+        self._sync_locked(state)
+        self.screen.blit(self.locked, self.field_rect)
+
+    def draw_ghost_piece(self, state: GameState) -> None:
+        ghost = self.ghost_piece(state)
+        if ghost:
+            self._draw_cells(ghost, self.ghost_sprites[ghost.color_index])
+
+    def draw_current_piece(self, piece: Tetromino) -> None:
+        self._draw_cells(piece, self.sprites[piece.color_index])
+
+    def _draw_cells(self, piece: Tetromino, sprite: pygame.Surface) -> None:
+        left, top = self.field_rect.topleft
+        for x, y in piece.get_positions():
+            if y >= 0:  # Only draw parts of the piece that are within the grid
+                self.screen.blit(sprite, (left + x * GRID_SIZE, top + y * GRID_SIZE))
+
+    def draw_sidebar(self, state: GameState) -> None:
+        self.screen.fill(BLACK, self.sidebar_rect)
+        self.hud.draw_sidebar(self.screen, state)
+
+    def draw_next_piece(self, piece: Optional[Tetromino]) -> None:
+        self.screen.fill(BLACK, self.next_rect)
+        self.hud.draw_next_label(self.screen, self.next_text_position)
+        if piece:
+            start_x, start_y = self.next_piece_position
+            sprite = self.sprites[piece.color_index]
+            for c, r in piece.offsets:
+                self.screen.blit(
+                    sprite, (start_x + c * GRID_SIZE, start_y + r * GRID_SIZE)
+                )
+
+    def draw_frame(self, state: GameState) -> None:
+        # Immediate-mode full frame, for screenshots and offscreen rendering
+        self.screen.fill(BLACK)
+        self.draw_sidebar(state)
+        self.draw_grid(state)
+        self.draw_ghost_piece(state)
+        self.draw_current_piece(state.current_piece)
+        self.draw_next_piece(state.next_piece)
+
+    def render(self, state: GameState) -> List[pygame.Rect]:
+        if self._full_redraw:
+            self._full_redraw = False
+            self.draw_frame(state)
+            self._piece_key = self._piece_state(state.current_piece)
+            self._piece_rect = self._piece_area(state)
+            self._sidebar_key = self._stats_key(state)
+            self._next_key = state.next_piece.name
+            return [self.screen.get_rect()]
+
+        dirty = []
+        piece = state.current_piece
+        piece_key = self._piece_state(piece)
+        piece_rect = self._piece_rect
+        board_changed = self._sync_locked(state)
+        if piece_key != self._piece_key or board_changed:
+            # The ghost moves with the piece and with the stack under it
+            piece_rect = self._piece_area(state)
+        if board_changed:
+            self.screen.blit(self.locked, self.field_rect)
+            dirty.append(self.field_rect)
+        elif piece_key != self._piece_key:
+            left, top = self.field_rect.topleft
+            # Erase the piece and its ghost where they were by restoring the
+            # locked cells under them
+            if self._piece_rect:
+                self.screen.blit(
+                    self.locked,
+                    self._piece_rect,
+                    self._piece_rect.move(-left, -top),
+                )
+                dirty.append(self._piece_rect)
+            if piece_rect:
+                self.screen.blit(self.locked, piece_rect, piece_rect.move(-left, -top))
+                dirty.append(piece_rect)
+        if dirty:
+            self.draw_ghost_piece(state)
+            self.draw_current_piece(piece)
+        self._piece_key = piece_key
+        self._piece_rect = piece_rect
+
+        stats_key = self._stats_key(state)
+        if stats_key != self._sidebar_key:
+            self._sidebar_key = stats_key
+            self.draw_sidebar(state)
+            dirty.append(self.sidebar_rect)
+        if state.next_piece.name != self._next_key:
+            self._next_key = state.next_piece.name
+            self.draw_next_piece(state.next_piece)
+            dirty.append(self.next_rect)
+        return dirty
+
+    @staticmethod
+    def _piece_state(piece: Tetromino):
+        return piece.name, piece.rotation, piece.x, piece.y
+
+    @staticmethod
+    def _stats_key(state: GameState):
+        return state.score, state.total_lines_cleared, state.total_blocks
+
+
+class ScaledDisplay:
+    # The window a native-resolution frame is shown in. Everything is drawn
+    # into `surface` at native size; with SDL's SCALED mode that surface is
+    # the window's own framebuffer and SDL scales it on the GPU when it is
+    # presented, so draw cost does not grow with the window. Where SCALED is
+    # unavailable, frames are drawn offscreen and scaled into the window,
+    # letterboxed, with one transform.scale per presented frame.
+    def __init__(self, size: Tuple[int, int], fullscreen: bool = False):
+        mode = pygame.FULLSCREEN if fullscreen else pygame.RESIZABLE
+        try:
+            self.window = pygame.display.set_mode(size, pygame.SCALED | mode)
+            self.surface = self.window
+            self.scaled = True
+        except pygame.error:
+            self.window = pygame.display.set_mode(size, mode)
+            self.surface = pygame.Surface(size)
+            self.scaled = False
+        self._stale = True
+
+    def handle_event(self, event: pygame.event.Event) -> None:
+        if not self.scaled and event.type in (
+            pygame.VIDEORESIZE,
+            pygame.WINDOWSIZECHANGED,
+            pygame.WINDOWEXPOSED,
+        ):
+            self.window = pygame.display.get_surface()
+            self._stale = True
+
+    def present(self, dirty: Optional[Sequence[pygame.Rect]] = None) -> None:
+        # Show the frame: the dirty rects, or all of it when dirty is None
+        if self.scaled:
+            if dirty is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty)
+            return
+        if not dirty and dirty is not None and not self._stale:
+            return
+        if self._stale:
+            self._stale = False
+            self.window.fill((0, 0, 0))
+        target = self.surface.get_rect().fit(self.window.get_rect())
+        pygame.transform.scale(
+            self.surface, target.size, self.window.subsurface(target)
+        )
+        pygame.display.flip()
@@ -0,0 +1,168 @@
+import argparse
+import struct
+import sys
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+from board import Board
+from engine import GameState
+
+# File layout: header, then one varint per input holding
+# (ticks since the previous input << ACTION_BITS) | action
+MAGIC = b"VTRP"
+VERSION = 2  # 2: seeds drive engine.PieceRandom, not random.Random
+HEADER = struct.Struct("<4sBQIIII")
+ACTION_BITS = 3
+MAX_SEED = 2**64 - 1  # the header stores the seed unsigned in 64 bits
+
+
+def seed_arg(text: str) -> int:
+    # argparse type for seeds that a Recording can store
+    seed = int(text)
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"seed must be in 0..{MAX_SEED}")
+    return seed
+
+
+def grid_checksum(grid: Board) -> int:
+    return zlib.crc32(b"".join(grid.colors))
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Recording:
+    # A game as its seed plus the (tick, action) inputs applied to it, with the
+    # final tick count, score and grid checksum to check replays against
+    def __init__(
+        self,
+        seed: int,
+        inputs: Optional[List[Tuple[int, int]]] = None,
+        ticks: int = 0,
+        score: int = 0,
+        grid_crc: int = 0,
+    ):
+        self.seed = seed
+        self.inputs = inputs if inputs is not None else []
+        self.ticks = ticks
+        self.score = score
+        self.grid_crc = grid_crc
+
+    def record(self, tick: int, action: int) -> None:
+        self.inputs.append((tick, action))
+
+    def finish(self, state: GameState) -> None:
+        self.ticks = state.ticks
+        self.score = state.score
+        self.grid_crc = grid_checksum(state.grid)
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.seed,
+                self.ticks,
+                self.score,
+                self.grid_crc,
+                len(self.inputs),
+            )
+        )
+        previous = 0
+        for tick, action in self.inputs:
+            _write_varint(out, (tick - previous) << ACTION_BITS | action)
+            previous = tick
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Recording":
+        magic, version, seed, ticks, score, grid_crc, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a vibetris recording")
+        inputs = []
+        offset = HEADER.size
+        tick = 0
+        for _ in range(count):
+            value, offset = _read_varint(data, offset)
+            tick += value >> ACTION_BITS
+            inputs.append((tick, value & ((1 << ACTION_BITS) - 1)))
+        return cls(seed, inputs, ticks, score, grid_crc)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def replay(recording: Recording) -> GameState:
+    # Re-simulate a recording as fast as possible, with no rendering or sound
+    state = GameState(recording.seed)
+    tick = state.tick
+    apply = state.apply
+    for input_tick, action in recording.inputs:
+        while state.ticks < input_tick and not state.game_over:
+            tick()
+        apply(action)
+    while state.ticks < recording.ticks and not state.game_over:
+        tick()
+    return state
+
+
+def matches(recording: Recording, state: GameState) -> bool:
+    return (
+        state.ticks == recording.ticks
+        and state.score == recording.score
+        and grid_checksum(state.grid) == recording.grid_crc
+    )
+
+
+def verify(recording: Recording) -> bool:
+    return matches(recording, replay(recording))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Replay recorded games headlessly and check their final state"
+    )
+    parser.add_argument("recordings", nargs="+")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for path in args.recordings:
+        recording = Recording.load(path)
+        start = time.perf_counter()
+        state = replay(recording)
+        elapsed = time.perf_counter() - start
+        ok = matches(recording, state)
+        failures += not ok
+        print(
+            f"{path}: {'ok' if ok else 'MISMATCH'} score {state.score} "
+            f"(recorded {recording.score}), {state.ticks} ticks, "
+            f"{len(recording.inputs)} inputs, {state.ticks / elapsed:.0f} ticks/s"
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+from typing import Callable, Dict, List
+
+from bot import bot_policy
+from engine import GameState, GRID_WIDTH, GRID_HEIGHT, HARD_DROP, PIECE_NAMES
+from profiler import percentile
+from telemetry import GameTelemetry, TelemetryWriter
+
+# A policy factory takes the game seed and returns a function mapping the
+# current GameState to the next action
+Policy = Callable[[GameState], int]
+
+
+def random_policy(seed: int) -> Policy:
+    # Hard drop is left out so the statistics stay comparable with games
+    # played before it existed: picked at random it would end most pieces
+    rng = random.Random(seed)
+    return lambda state: rng.choice(
+        [action for action in state.legal_actions() if action != HARD_DROP]
+    )
+
+
+POLICIES: Dict[str, Callable[[int], Policy]] = {
+    "random": random_policy,
+    "bot": bot_policy,
+}
+
+
+def load_policy(name: str) -> Callable[[int], Policy]:
+    # Either a built-in policy name or "module:factory"
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"unknown policy {name!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def play_game(
+    seed: int,
+    policy_name: str,
+    max_ticks: int,
+    width: int = GRID_WIDTH,
+    height: int = GRID_HEIGHT,
+    telemetry: bool = False,
+) -> dict:
+    # With telemetry, the game's piece and game records are returned under
+    # "telemetry" for the parent process to write
+    state = GameState(seed, width, height)
+    policy = load_policy(policy_name)(seed)
+    step = state.step
+    if telemetry:
+        records: List[dict] = []
+        recorder = GameTelemetry(records.append, state, source=policy_name)
+        while not state.game_over and state.ticks < max_ticks:
+            step(policy(state))
+            recorder.observe(state, state.events)
+        recorder.finish(state)
+    else:
+        while not state.game_over and state.ticks < max_ticks:
+            step(policy(state))
+    result = {
+        "seed": seed,
+        "score": state.score,
+        "lines": state.total_lines_cleared,
+        "pieces": state.total_blocks,
+        "ticks": state.ticks,
+        "block_counts": state.block_counts,
+    }
+    if telemetry:
+        result["telemetry"] = records
+    return result
+
+
+def _play_game(args) -> dict:
+    return play_game(*args)
+
+
+def summarize(results: List[dict]) -> dict:
+    summary = {"games": len(results)}
+    for key in ("score", "lines", "pieces", "ticks"):
+        values = sorted(result[key] for result in results)
+        summary[key] = {
+            "mean": sum(values) / len(values) if values else 0,
+            "min": values[0] if values else 0,
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else 0,
+        }
+    block_counts = {name: 0 for name in PIECE_NAMES}
+    for result in results:
+        for name, count in result["block_counts"].items():
+            block_counts[name] += count
+    total_blocks = sum(block_counts.values())
+    summary["block_counts"] = {
+        name: {
+            "count": count,
+            "percent": count / total_blocks * 100 if total_blocks else 0,
+        }
+        for name, count in block_counts.items()
+    }
+    return summary
+
+
+def print_summary(summary: dict, elapsed: float) -> None:
+    games = summary["games"]
+    print(f"{games} games in {elapsed:.2f}s ({games / elapsed:.1f} games/s)")
+    columns = ("mean", "min", "p50", "p90", "p99", "max")
+    print(" " * 8 + "".join(f"{column:>10}" for column in columns))
+    for key in ("score", "lines", "pieces", "ticks"):
+        row = summary[key]
+        print(f"{key:8}" + "".join(f"{row[column]:>10.1f}" for column in columns))
+    blocks = ", ".join(
+        f"{name} {value['percent']:.1f}%"
+        for name, value in summary["block_counts"].items()
+    )
+    print(f"Blocks: {blocks}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Play seeded headless games in parallel and report statistics"
+    )
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--policy", default="random")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-ticks", type=int, default=1_000_000)
+    parser.add_argument("--width", type=int, default=GRID_WIDTH)
+    parser.add_argument("--height", type=int, default=GRID_HEIGHT)
+    parser.add_argument("--json", action="store_true", help="print JSON summary")
+    parser.add_argument(
+        "--telemetry",
+        metavar="PATH",
+        help="append per-piece and per-game records to PATH (.jsonl or .db)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        load_policy(args.policy)  # Fail fast on a bad policy name
+    except (ValueError, ImportError, AttributeError) as exc:
+        parser.error(str(exc))
+    writer = None
+    if args.telemetry:
+        writer = TelemetryWriter(args.telemetry)
+        writer.start()
+    jobs = [
+        (seed, args.policy, args.max_ticks, args.width, args.height, bool(writer))
+        for seed in range(args.seed, args.seed + args.games)
+    ]
+    start = time.perf_counter()
+    results = []
+
+    def collect(result: dict) -> None:
+        for record in result.pop("telemetry", ()):
+            writer.post(record, block=True)
+        results.append(result)
+
+    if args.workers > 1:
+        with Pool(args.workers) as pool:
+            chunksize = max(1, len(jobs) // (args.workers * 8))
+            for result in pool.imap_unordered(_play_game, jobs, chunksize):
+                collect(result)
+    else:
+        for job in jobs:
+            collect(_play_game(job))
+    if writer:
+        writer.stop(timeout=None)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    if args.json:
+        summary["elapsed"] = elapsed
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print_summary(summary, elapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
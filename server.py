@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import itertools
+import random
+import struct
+import sys
+from typing import Dict, List, Optional, Set
+
+from board import Board
+from bot import Bot
+from engine import GameState, ACTIONS, NOOP, PIECE_NAMES, TICK_RATE
+from telemetry import GameTelemetry, TelemetryWriter
+
+# Server -> client messages are length-prefixed binary frames. Every frame
+# starts with STATE; a FULL frame follows it with the board size and one
+# palette byte per cell, a DELTA frame with the number of changed cells and
+# CELL (x, y, palette index) for each.
+#
+# Client -> server messages are text lines:
+#   new [bot|player] [seed]  start a session and watch it
+#   watch ID                 spectate a session
+#   input ID ACTION          queue an action (engine action number) for a
+#                            player session, applied on the next tick
+#   list                     print the running sessions
+LENGTH = struct.Struct("<I")
+STATE = struct.Struct("<BIIIIBBhhBB")
+SIZE = struct.Struct("<HH")
+COUNT = struct.Struct("<H")
+CELL = struct.Struct("<HHB")
+FULL = 0
+DELTA = 1
+TEXT = 2  # STATE is not sent; the payload is a UTF-8 reply to a command
+
+TICK_SECONDS = 1 / TICK_RATE
+MAX_LAG = 0.25  # seconds of ticks to drop after a stall
+MAX_BUFFER = 1 << 20  # bytes queued for a client before it is dropped
+LINGER_TICKS = 5 * TICK_RATE  # ticks a finished game stays up for spectators
+
+
+class Session:
+    # One game: its state, who drives it and who watches it. Deltas are taken
+    # against what was last broadcast, so every subscriber gets the same bytes.
+    def __init__(
+        self,
+        session_id: int,
+        seed: int,
+        bot: bool,
+        telemetry: Optional[TelemetryWriter] = None,
+    ):
+        self.id = session_id
+        self.state = GameState(seed)
+        self.bot = Bot() if bot else None
+        self.telemetry = telemetry and GameTelemetry(
+            telemetry.post, self.state, "bot" if bot else "player"
+        )
+        self.pending: List[int] = []
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self.finished_ticks = 0
+        grid = self.state.grid
+        self._sent_colors = [bytes(grid.width) for _ in range(grid.height)]
+        self._sent_version = -1
+        self._sent_state = None
+
+    def tick(self) -> None:
+        state = self.state
+        if state.game_over:
+            self.finished_ticks += 1
+            return
+        if self.bot:
+            state.apply(self.bot.act(state))
+        for action in self.pending:
+            state.apply(action)
+        self.pending.clear()
+        state.tick()
+        events = state.pop_events()
+        if self.telemetry:
+            self.telemetry.observe(state, events)
+            if state.game_over:
+                self.telemetry.finish(state)
+
+    def _state_fields(self, kind: int) -> tuple:
+        state = self.state
+        piece = state.current_piece
+        return (
+            kind,
+            self.id,
+            state.ticks,
+            state.score,
+            state.total_lines_cleared,
+            PIECE_NAMES.index(piece.name),
+            piece.rotation,
+            piece.x,
+            piece.y,
+            PIECE_NAMES.index(state.next_piece.name),
+            state.game_over,
+        )
+
+    def full_frame(self) -> bytes:
+        grid = self.state.grid
+        return b"".join(
+            [
+                STATE.pack(*self._state_fields(FULL)),
+                SIZE.pack(grid.width, grid.height),
+                *grid.colors,
+            ]
+        )
+
+    def delta_frame(self) -> Optional[bytes]:
+        # Changed cells and the piece since the last call, or None when
+        # nothing visible changed
+        grid = self.state.grid
+        cells = []
+        if grid.version != self._sent_version:
+            self._sent_version = grid.version
+            for y, colors in enumerate(grid.colors):
+                sent = self._sent_colors[y]
+                if colors != sent:
+                    for x, (now, before) in enumerate(zip(colors, sent)):
+                        if now != before:
+                            cells.append(CELL.pack(x, y, now))
+                    self._sent_colors[y] = bytes(colors)
+        fields = self._state_fields(DELTA)
+        if not cells and fields[3:] == self._sent_state:
+            return None
+        self._sent_state = fields[3:]
+        return b"".join([STATE.pack(*fields), COUNT.pack(len(cells)), *cells])
+
+
+def decode_frame(payload: bytes) -> dict:
+    # Client side: a frame as a dict; "cells" lists (x, y, palette index)
+    kind = payload[0]
+    if kind == TEXT:
+        return {"kind": TEXT, "text": payload[1:].decode()}
+    (
+        kind,
+        session,
+        tick,
+        score,
+        lines,
+        piece,
+        rotation,
+        x,
+        y,
+        next_piece,
+        game_over,
+    ) = STATE.unpack_from(payload)
+    frame = {
+        "kind": kind,
+        "session": session,
+        "tick": tick,
+        "score": score,
+        "lines": lines,
+        "piece": (PIECE_NAMES[piece], rotation, x, y),
+        "next_piece": PIECE_NAMES[next_piece],
+        "game_over": bool(game_over),
+    }
+    offset = STATE.size
+    if kind == FULL:
+        width, height = SIZE.unpack_from(payload, offset)
+        offset += SIZE.size
+        frame["size"] = (width, height)
+        frame["cells"] = [
+            (x, y, payload[offset + y * width + x])
+            for y in range(height)
+            for x in range(width)
+        ]
+    else:
+        (count,) = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        frame["cells"] = [
+            CELL.unpack_from(payload, offset + i * CELL.size) for i in range(count)
+        ]
+    return frame
+
+
+def apply_frame(board: Optional[Board], frame: dict) -> Board:
+    # Client side: bring a mirror of the session's board up to date
+    if frame["kind"] == FULL:
+        board = Board(*frame["size"])
+    for x, y, color_index in frame["cells"]:
+        if color_index:
+            board.set_cell(x, y, color_index)
+        else:
+            board.clear_cell(x, y)
+    return board
+
+
+class GameServer:
+    # Hosts any number of sessions in one process and advances them all on a
+    # single fixed-rate tick loop
+    def __init__(
+        self,
+        bots: int = 0,
+        seed: Optional[int] = None,
+        telemetry: Optional[TelemetryWriter] = None,
+    ):
+        self.sessions: Dict[int, Session] = {}
+        self.bots = bots  # bot games kept running for spectators
+        self.telemetry = telemetry
+        self._ids = itertools.count(1)
+        self._seeds = random.Random(seed)
+        self.ticks = 0
+        for _ in range(bots):
+            self.new_session(bot=True)
+
+    def new_session(self, bot: bool, seed: Optional[int] = None) -> Session:
+        if seed is None:
+            seed = self._seeds.randrange(2**32)
+        session = Session(next(self._ids), seed, bot, self.telemetry)
+        self.sessions[session.id] = session
+        return session
+
+    def tick(self) -> None:
+        finished = []
+        for session in self.sessions.values():
+            session.tick()
+            if session.subscribers:
+                frame = session.delta_frame()
+                if frame is not None:
+                    self._broadcast(session, frame)
+            if session.finished_ticks > LINGER_TICKS:
+                finished.append(session)
+        for session in finished:
+            del self.sessions[session.id]
+            if session.bot and self.bots:
+                self.new_session(bot=True)
+        self.ticks += 1
+
+    def _send(self, writer: asyncio.StreamWriter, payload: bytes) -> bool:
+        # False if the client has gone or stopped reading
+        if writer.is_closing():
+            return False
+        if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            writer.close()
+            return False
+        writer.write(LENGTH.pack(len(payload)) + payload)
+        return True
+
+    def _broadcast(self, session: Session, frame: bytes) -> None:
+        for writer in list(session.subscribers):
+            if not self._send(writer, frame):
+                session.subscribers.discard(writer)
+
+    def _reply(self, writer: asyncio.StreamWriter, text: str) -> None:
+        self._send(writer, bytes([TEXT]) + text.encode())
+
+    def watch(self, session: Session, writer: asyncio.StreamWriter) -> None:
+        # Bring the deltas up to date first so the FULL frame is their base
+        frame = session.delta_frame()
+        if frame is not None:
+            self._broadcast(session, frame)
+        session.subscribers.add(writer)
+        self._send(writer, session.full_frame())
+
+    def command(self, line: str, writer: asyncio.StreamWriter) -> None:
+        words = line.split()
+        if not words:
+            return
+        try:
+            if words[0] == "new":
+                kind = words[1] if len(words) > 1 else "player"
+                if kind not in ("bot", "player"):
+                    raise ValueError(f"unknown session kind {kind!r}")
+                seed = int(words[2]) if len(words) > 2 else None
+                self.watch(self.new_session(kind == "bot", seed), writer)
+            elif words[0] == "watch":
+                self.watch(self.sessions[int(words[1])], writer)
+            elif words[0] == "input":
+                session = self.sessions[int(words[1])]
+                action = int(words[2])
+                if session.bot or action not in ACTIONS:
+                    raise ValueError("input needs a player session and an action")
+                if action != NOOP:
+                    session.pending.append(action)
+            elif words[0] == "list":
+                self._reply(
+                    writer,
+                    "\n".join(
+                        f"{session.id} {'bot' if session.bot else 'player'} "
+                        f"score {session.state.score}"
+                        f"{' over' if session.state.game_over else ''}"
+                        for session in self.sessions.values()
+                    ),
+                )
+            else:
+                raise ValueError(f"unknown command {words[0]!r}")
+        except KeyError:
+            self._reply(writer, "error: no such session")
+        except (ValueError, IndexError) as exc:
+            self._reply(writer, f"error: {exc}")
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.command(line.decode(errors="replace"), writer)
+        except ConnectionError:
+            pass
+        finally:
+            for session in self.sessions.values():
+                session.subscribers.discard(writer)
+            writer.close()
+
+    async def run(self) -> None:
+        # Fixed-rate ticks for every session; after a stall longer than
+        # MAX_LAG the missed ticks are dropped rather than replayed
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.tick()
+            next_tick += TICK_SECONDS
+            delay = next_tick - loop.time()
+            if delay < -MAX_LAG:
+                next_tick = loop.time()
+            await asyncio.sleep(max(0.0, delay))
+
+
+async def serve(args, telemetry: Optional[TelemetryWriter]) -> None:
+    server = GameServer(args.bots, args.seed, telemetry)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle_client, args.unix)
+    else:
+        listener = await asyncio.start_server(
+            server.handle_client, args.host, args.port
+        )
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"serving {len(server.sessions)} bot games on {where}", flush=True)
+    async with listener:
+        await server.run()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Host many game sessions for remote players and spectators"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket")
+    parser.add_argument("--bots", type=int, default=0, help="bot games to keep running")
+    parser.add_argument("--seed", type=int, help="seed for the session seeds")
+    parser.add_argument(
+        "--telemetry",
+        metavar="PATH",
+        help="append per-piece and per-game records to PATH (.jsonl or .db)",
+    )
+    args = parser.parse_args(argv)
+    telemetry = None
+    if args.telemetry:
+        telemetry = TelemetryWriter(args.telemetry)
+        telemetry.start()
+    try:
+        asyncio.run(serve(args, telemetry))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if telemetry:
+            telemetry.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import heapq
+import itertools
+import math
+import os
+import tempfile
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pygame
+
+SAMPLE_RATE = 44100
+# Synthesized samples are kept here between runs, one file per sound
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "vibetris",
+    "sounds",
+)
+
+
+def generate_square_wave(frequency, duration, sample_rate=SAMPLE_RATE, amplitude=0.5):
+    # Signed 16-bit samples of a square wave, as a NumPy array
+    samples = int(sample_rate * duration)
+    value = int(32760 * amplitude)
+    t = np.arange(samples, dtype=np.float64) / sample_rate
+    wave = np.sin(2 * math.pi * frequency * t) >= 0
+    return np.where(wave, value, -value).astype(np.int16)
+
+
+def load_samples(cache_dir, frequency, duration, amplitude=0.5) -> bytes:
+    # The samples of generate_square_wave as bytes, read from cache_dir when
+    # an earlier run saved them there. A missing or unwritable cache only
+    # costs the synthesis.
+    if cache_dir is None:
+        return generate_square_wave(frequency, duration, amplitude=amplitude).tobytes()
+    path = os.path.join(
+        cache_dir, f"{frequency:g}_{duration:g}_{amplitude:g}_{SAMPLE_RATE}.pcm"
+    )
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+    data = generate_square_wave(frequency, duration, amplitude=amplitude).tobytes()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+    return data
+
+
+class SoundCache:
+    # Bounded LRU cache of synthesized pygame Sounds keyed by
+    # (frequency, duration, amplitude), backed by the sample files in
+    # cache_dir (None to always synthesize); the mixer must be initialized
+    # first
+    def __init__(self, max_size: int = 128, cache_dir: Optional[str] = CACHE_DIR):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._sounds: "OrderedDict[Tuple[float, float, float], pygame.mixer.Sound]"
+        self._sounds = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sounds)
+
+    def get(self, frequency, duration, amplitude=0.5) -> pygame.mixer.Sound:
+        key = (frequency, duration, amplitude)
+        sound = self._sounds.get(key)
+        if sound is None:
+            sound = pygame.mixer.Sound(
+                buffer=load_samples(self.cache_dir, frequency, duration, amplitude)
+            )
+            self._sounds[key] = sound
+            if len(self._sounds) > self.max_size:
+                self._sounds.popitem(last=False)
+        else:
+            self._sounds.move_to_end(key)
+        return sound
+
+    def render_melody(
+        self, melody: Sequence[Tuple[float, float]], amplitude=0.2
+    ) -> List[pygame.mixer.Sound]:
+        # Pre-render every (frequency, duration) note of a melody
+        return [
+            self.get(frequency, duration, amplitude) for frequency, duration in melody
+        ]
+
+
+class SoundScheduler:
+    # Timed queue of sounds to start later, so sequences like the line-clear
+    # beeps never block the game loop; update() plays whatever is due
+    def __init__(self):
+        self._queue = []
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def schedule(self, sound: pygame.mixer.Sound, at: int, channel=None) -> None:
+        heapq.heappush(self._queue, (at, next(self._order), sound, channel))
+
+    def next_time(self) -> int:
+        # When the earliest scheduled sound is due
+        return self._queue[0][0]
+
+    def update(self, now: int) -> None:
+        queue = self._queue
+        while queue and queue[0][0] <= now:
+            _, _, sound, channel = heapq.heappop(queue)
+            if channel is not None:
+                channel.play(sound)
+            else:
+                sound.play()
+
+    def clear(self) -> None:
+        self._queue.clear()
@@ -0,0 +1,252 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, List, Optional
+
+from engine import GameState, Event
+
+# Records are dicts with a "type" of "piece" or "game". A path ending in .db,
+# .sqlite or .sqlite3 is written as an SQLite database with the two tables
+# below; anything else gets one JSON object per line, appended.
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+PIECE_COLUMNS = (
+    "session",
+    "piece_index",
+    "tick",
+    "piece",
+    "rotation",
+    "x",
+    "y",
+    "lines",
+    "lock_ticks",
+    "fall_speed",
+)
+GAME_COLUMNS = (
+    "session",
+    "source",
+    "seed",
+    "width",
+    "height",
+    "started",
+    "duration",
+    "ticks",
+    "score",
+    "lines",
+    "pieces",
+    "tetrises",
+    "max_tetris_multiplier",
+    "speedups",
+    "fall_speed",
+    "block_counts",
+)
+_STOP = object()
+
+
+class GameTelemetry:
+    # Turns one game's events into records for a sink (TelemetryWriter.post,
+    # or list.append to collect them): a "piece" record per "placed" event
+    # and a "game" summary from finish(). Feed it every event the game emits.
+    def __init__(
+        self,
+        sink: Callable[[dict], None],
+        state: GameState,
+        source: str = "player",
+    ):
+        self.sink = sink
+        self.session = uuid.uuid4().hex
+        self.source = source
+        self.seed = state.seed
+        self.width = state.width
+        self.height = state.height
+        self.started = time.time()
+        self.pieces = 0
+        self.tetrises = 0
+        self.max_tetris_multiplier = 0
+        self.speedups = 0
+        self.finished = False
+
+    def observe(self, state: GameState, events: Iterable[Event]) -> None:
+        for kind, value in events:
+            if kind == "placed":
+                self.sink(
+                    {
+                        "type": "piece",
+                        "session": self.session,
+                        "piece_index": self.pieces,
+                        "tick": state.ticks,
+                        "piece": value.name,
+                        "rotation": value.rotation,
+                        "x": value.x,
+                        "y": value.y,
+                        "lines": value.lines,
+                        "lock_ticks": value.ticks,
+                        "fall_speed": state.fall_speed,
+                    }
+                )
+                self.pieces += 1
+            elif kind == "tetris":
+                self.tetrises += 1
+                self.max_tetris_multiplier = max(self.max_tetris_multiplier, value)
+            elif kind == "cycle":
+                self.speedups += 1
+
+    def finish(self, state: GameState) -> None:
+        # Post the summary; only the first call counts
+        if self.finished:
+            return
+        self.finished = True
+        self.sink(
+            {
+                "type": "game",
+                "session": self.session,
+                "source": self.source,
+                "seed": self.seed,
+                "width": self.width,
+                "height": self.height,
+                "started": self.started,
+                "duration": time.time() - self.started,
+                "ticks": state.ticks,
+                "score": state.score,
+                "lines": state.total_lines_cleared,
+                "pieces": state.total_blocks,
+                "tetrises": self.tetrises,
+                "max_tetris_multiplier": self.max_tetris_multiplier,
+                "speedups": self.speedups,
+                "fall_speed": state.fall_speed,
+                "block_counts": dict(state.block_counts),
+            }
+        )
+
+
+class TelemetryWriter(threading.Thread):
+    # Writes records on its own thread in batches of up to batch_size, or
+    # whatever has arrived after flush_interval seconds. post() never blocks
+    # by default: once max_pending records are waiting, new ones are counted
+    # in `dropped` and discarded. Offline tools pass block=True instead. A
+    # batch that fails to write is counted in `dropped` too, with the error
+    # kept in `error`; the writer carries on with the next one.
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        max_pending: int = 100_000,
+    ):
+        super().__init__(name="telemetry", daemon=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records: "queue.Queue" = queue.Queue(max_pending)
+        self.written = 0
+        self.dropped = 0
+        self.error: Optional[Exception] = None
+        # Opened here so a bad path fails in the caller; only the writer
+        # thread uses them afterwards
+        self._db = self._file = None
+        if path.endswith(SQLITE_SUFFIXES):
+            self._open_sqlite()
+        else:
+            self._file = open(path, "a")
+
+    def post(self, record: dict, block: bool = False) -> None:
+        if block:
+            # Wait for room, unless the writer has stopped
+            while self.is_alive():
+                try:
+                    self.records.put(record, timeout=1.0)
+                    return
+                except queue.Full:
+                    pass
+            self.dropped += 1
+            return
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        # Write what is queued, then end the thread
+        while True:
+            try:
+                self.records.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                if not self.is_alive():
+                    return
+        self.join(timeout)
+
+    def run(self) -> None:
+        write = self._write_sqlite if self._db else self._write_jsonl
+        try:
+            stopping = False
+            while not stopping:
+                batch: List[dict] = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        record = self.records.get(
+                            timeout=max(0.0, deadline - time.monotonic())
+                        )
+                    except queue.Empty:
+                        break
+                    if record is _STOP:
+                        stopping = True
+                        break
+                    batch.append(record)
+                if batch:
+                    try:
+                        write(batch)
+                    except (sqlite3.Error, OverflowError, OSError) as error:
+                        self.error = error
+                        self.dropped += len(batch)
+                    else:
+                        self.written += len(batch)
+        finally:
+            if self._db:
+                self._db.close()
+            else:
+                self._file.close()
+
+    def _write_jsonl(self, batch: List[dict]) -> None:
+        self._file.write("".join(json.dumps(record) + "\n" for record in batch))
+        self._file.flush()
+
+    def _open_sqlite(self) -> None:
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS pieces ({', '.join(PIECE_COLUMNS)})"
+        )
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS games ({', '.join(GAME_COLUMNS)})"
+        )
+        self._db.commit()
+
+    def _write_sqlite(self, batch: List[dict]) -> None:
+        pieces = []
+        games = []
+        for record in batch:
+            if record["type"] == "piece":
+                pieces.append(tuple(record[column] for column in PIECE_COLUMNS))
+            else:
+                # Seeds go up to 2**64 - 1, past SQLite's INTEGER range
+                seed = record["seed"]
+                record = dict(
+                    record,
+                    seed=None if seed is None else str(seed),
+                    block_counts=json.dumps(record["block_counts"]),
+                )
+                games.append(tuple(record[column] for column in GAME_COLUMNS))
+        with self._db:
+            if pieces:
+                self._db.executemany(
+                    f"INSERT INTO pieces VALUES ({', '.join('?' * len(PIECE_COLUMNS))})",
+                    pieces,
+                )
+            if games:
+                self._db.executemany(
+                    f"INSERT INTO games VALUES ({', '.join('?' * len(GAME_COLUMNS))})",
+                    games,
+                )